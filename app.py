@@ -1,26 +1,26 @@
 from shiny import App, ui, render, reactive
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-from sklearn.cluster import KMeans
-
-import plotly.express as px
 import numpy as np
 
-import json
 import os
 
-import plotly.graph_objects as go
+# matplotlib, plotly, sklearn, transformers and selenium are imported inside the features
+# using them, so the app starts without them (see tools/profile_startup.py)
 
 from places_api.restaurants import ClujRestaurants, Restaurant
 from credentials.credentials_provider import get_gplaces_api_key
-from webscraping.scraper import scrape_restaurant_data
+from places_api.linkage import employee_count
+from places_api.export import CsvExportSink
+from places_api.aggregates import emotion_trend
+from places_api.repository import RestaurantRepository
+from dashboard.plots import chart_image
+from dashboard.clustering import FEATURES, add_emotion_scores, cluster_stats, density_downsample, feature_matrix, fit_clusters
 
 ability_to_load_data = False
 
 API_KEY = get_gplaces_api_key()
 data_file = './data/google_restaurants.csv'
+reviews_file = './data/reviews_with_emotions_google.json'
 
 locations = [
         "46.770439,23.591423",
@@ -35,7 +35,12 @@ locations_long = [
 ]
 radius = 1000
 
-restaurants = ClujRestaurants(api_key=API_KEY, locations=locations_long, radius=radius)
+# The dashboard queries the restaurants and reviews here, filled from the CSV and JSON on first start
+repository = RestaurantRepository()
+if (repository.is_empty() or not repository.reviews.exists()) and os.path.exists(data_file):
+    repository.import_files(data_file, reviews_file)
+
+restaurants = ClujRestaurants(api_key=API_KEY, locations=locations_long, radius=radius, repository=repository)
 
 ROWS_PER_PAGE = 10
 
@@ -82,11 +87,11 @@ app_ui = ui.page_navbar(
                     ui.navset_pill(
                         ui.nav_panel(
                             "Rating histogram",
-                            ui.card(ui.output_plot("pie_chart_ratings")),
+                            ui.card(ui.output_image("pie_chart_ratings")),
                         ),
                         ui.nav_panel(
                             "Distance/Rating",
-                            ui.card(ui.output_plot("regression_dr"))
+                            ui.card(ui.output_image("regression_dr"))
                         )
                     )
         
@@ -151,7 +156,8 @@ app_ui = ui.page_navbar(
                 ui.card(
                     "Restaurant Reviews",
                     ui.output_ui("restaurant_details"),
-                    ui.output_plot("restaurant_reviews_plot")
+                    ui.output_plot("restaurant_reviews_plot"),
+                    ui.output_plot("restaurant_trend_plot")
                 )
             )
         )
@@ -197,24 +203,25 @@ def server(input, output, session):
     @reactive.event(input.refresh_btn, ignore_none=False)
     def restaurants_table():
 
-        json_file_path = './data/reviews_with_emotions_google.json'
-
         if ability_to_load_data:
             print("Loading the data")
-            if os.path.exists(json_file_path):
+            if os.path.exists(reviews_file):
                # Delete the file
-               os.remove(json_file_path)
-            restaurants.fetch_restaurants()
-            restaurants.export_to_csv(data_file)
+               os.remove(reviews_file)
+            # Everything is fetched again and refills the repository and the CSV files
+            repository.clear()
+            restaurants.reset()
+            # Every restaurant is written as soon as it is fetched
+            with CsvExportSink(data_file) as sink:
+                restaurants.fetch_restaurants(sink=sink)
             restaurants.scrape_employee_data()
         print("The data is loaded")
 
-        # Load the CSV data
-        df = pd.read_csv(data_file)
+        # Load the restaurants
+        df = repository.restaurants_frame()
 
-        # Remove the 'reviews' column if it exists
-        if 'Reviews' in df.columns:
-            df = df.drop(columns=['Reviews', 'Place ID'])
+        # Remove the place ids
+        df = df.drop(columns=['Place ID'])
 
         # Add an 'index' column and move it to the leftmost position
         df['index'] = [i for i in range(1, len(df) + 1)]
@@ -223,82 +230,26 @@ def server(input, output, session):
         # Return the DataFrame as a DataGrid for display
         return render.DataGrid(df, selection_mode="rows", filters=True)
     
-    @render.plot
+    @render.image(delete_file=False)
     @reactive.event(input.refresh_btn, ignore_none=False)
     def pie_chart_ratings():
-        #print("olvasom")
-        df = pd.read_csv(data_file)
-
-        # Create custom bins from 3.0 to 5.0 with a step of 0.1
-        bins = [x / 10.0 for x in range(10, 52)]  # This will create bins: [3.0, 3.1, 3.2, ..., 5.0]
-
-        fig, ax = plt.subplots()
-
-        # Plot the histogram with custom bins
-        ax.hist(df['Rating'], bins=bins, edgecolor='black', alpha=0.7)
-
-        # Set the labels and title
-        ax.set_xlabel('Rating')
-        ax.set_ylabel('Count')
-        ax.set_title('Distribution of Ratings')
-
-        # Set the x-axis ticks to match the bins (so each rating is clearly labeled)
-        ax.set_xticks(bins)
-        ax.set_xticklabels([f'{x:.1f}' for x in bins], fontsize=6)
-
-        plt.xticks(rotation=90)
-
-        # Show the histogram
-        return fig
+        # Rendered once per data version and shared by all the sessions
+        return {"src": chart_image("rating_histogram", data_file), "width": "100%"}
     
     
-    @render.plot
+    @render.image(delete_file=False)
     @reactive.event(input.refresh_btn, ignore_none=False)
     def regression_dr():
-        # Read the CSV data
-        df = pd.read_csv(data_file)
-
-        # Check if the necessary columns exist
-        if 'Distance from Center' not in df.columns or 'Rating' not in df.columns:
-            print("Error: Required columns not found in the data.")
-            return None  # Return None if the required columns are missing
-
-        # Extract the distance and rating data
-        distances = df['Distance from Center']  # Remove any NaN values
-        ratings = df['Rating']  # Remove any NaN values
-        restaurant_names = df['Name']  # Assuming the column 'Name' contains restaurant names
-
-        # Create the plot
-        fig, ax = plt.subplots(figsize=(8, 6))
-
-        # Scatter plot
-        scatter = ax.scatter(distances, ratings, alpha=0.7, color='blue')
-
-        # Set the labels and title
-        ax.set_xlabel('Distance from City Center (km)', fontsize=12)
-        ax.set_ylabel('Restaurant Rating', fontsize=12)
-        ax.set_title('Distance vs Restaurant Rating', fontsize=14)
-
-        # Add a regression line
-        sns.regplot(x=distances, y=ratings, ax=ax, scatter=False)
-
-        # Show the plot
-        return fig
+        # Rendered once per data version and shared by all the sessions
+        return {"src": chart_image("distance_rating", data_file), "width": "100%"}
     
     @render.ui
     @reactive.event(input.search_btn, ignore_none=False)
     def restaurant_details():
-        # Load the JSON data
-        with open('./data/reviews_with_emotions_google.json', 'r', encoding='utf-8') as file:
-            reviews_data = json.load(file)
-
         query = input.search_query().strip().lower()
 
-        # Filter reviews for restaurants that match the query
-        matching_reviews = [
-            review for review in reviews_data
-            if query in review['restaurant_name'].lower()
-        ]
+        # Reviews for restaurants that match the query
+        matching_reviews = repository.reviews_matching(query)
 
         if matching_reviews:
             # Group reviews by restaurant name
@@ -336,79 +287,67 @@ def server(input, output, session):
     @render.text
     @reactive.event(input.search_btn, ignore_none=False)
     def name_name():
-        df = pd.read_csv(data_file)
         query = input.search_query().strip().lower()
-        results = df[df['Name'].str.lower().str.contains(query, na=False)]
+        restaurant = repository.find_by_name(query)
 
-        if len(results['Name'].tolist()) > 0:
-            return results['Name'].tolist()[0]
+        if restaurant is not None:
+            return restaurant['name']
         return "No such place"
     
     @render.text
     @reactive.event(input.search_btn, ignore_none=False)
     def rating_rating():
-        df = pd.read_csv(data_file)
         query = input.search_query().strip().lower()
-        results = df[df['Name'].str.lower().str.contains(query, na=False)]
+        restaurant = repository.find_by_name(query)
 
-        if len(results['Name'].tolist()) > 0:
-            return results['Rating'].tolist()[0]
+        if restaurant is not None:
+            return restaurant['rating']
         return "No such place"
     
     @render.text
     @reactive.event(input.search_btn, ignore_none=False)
     def address_address():
-        df = pd.read_csv(data_file)
         query = input.search_query().strip().lower()
-        results = df[df['Name'].str.lower().str.contains(query, na=False)]
+        restaurant = repository.find_by_name(query)
 
-        if len(results['Name'].tolist()) > 0:
-            return results['Address'].tolist()[0]
+        if restaurant is not None:
+            return restaurant['address']
         return "No such place"
     
     @render.text
     @reactive.event(input.search_btn, ignore_none=False)
     def distance_distance():
-        df = pd.read_csv(data_file)
         query = input.search_query().strip().lower()
-        results = df[df['Name'].str.lower().str.contains(query, na=False)]
+        restaurant = repository.find_by_name(query)
 
-        if len(results['Name'].tolist()) > 0:
-            return results['Distance from Center'].tolist()[0]
+        if restaurant is not None:
+            return restaurant['distance']
         return "No such place"
     
     @render.text
     @reactive.event(input.search_btn, ignore_none=False)
     def employee_num():
-        df = pd.read_csv(data_file)
         query = input.search_query().strip().lower()
-        results = df[df['Name'].str.lower().str.contains(query, na=False)]
+        restaurant = repository.find_by_name(query)
 
-        if len(results['Name'].tolist()) > 0:
-            return scrape_restaurant_data([results['Name'].tolist()[0]])
+        if restaurant is not None:
+            # Comes from the match table between the restaurants and the scraped employee data
+            employees = employee_count(restaurant['place_id'])
+            return employees if employees is not None else "Unknown"
         return "No such place"
     
     @render.plot
     @reactive.event(input.search_btn, ignore_none=False)
     def restaurant_reviews_plot():
-        # Load the JSON data for reviews
-        with open('./data/reviews_with_emotions_google.json', 'r', encoding='utf-8') as file:
-            reviews_data = json.load(file)
+        import matplotlib.pyplot as plt
 
         query = input.search_query().strip().lower()
 
-        # Filter reviews for restaurants that match the query
-        matching_reviews = [
-            review for review in reviews_data
-            if query in review['restaurant_name'].lower()
-        ]
+        # Count of each emotion, counted by the database
+        counts = repository.emotion_counts(query)
 
-        if matching_reviews:
-            # Group reviews by emotion
-            emotions = [review['emotion'] for review in matching_reviews]
-            
-            # Create a count of each emotion
-            emotion_counts = pd.Series(emotions).value_counts()
+        if counts:
+            emotion_counts = pd.Series(dict(counts))
 
             # Create the plot
             fig, ax = plt.subplots(figsize=(8, 6))
@@ -431,74 +370,99 @@ def server(input, output, session):
             return fig
         
 
+    @render.plot
+    @reactive.event(input.search_btn, ignore_none=False)
+    def restaurant_trend_plot():
+        import matplotlib.pyplot as plt
+
+        query = input.search_query().strip().lower()
+
+        # Served from the monthly rollups, the reviews themselves are not read
+        trend = emotion_trend(query)
+
+        fig, ax = plt.subplots(figsize=(8, 4))
+        if not trend:
+            ax.text(0.5, 0.5, 'No dated reviews found for this restaurant', ha='center', va='center', fontsize=12)
+            ax.axis('off')
+            return fig
+
+        months = list(trend)
+        emotions = sorted({emotion for month in trend.values() for emotion in month['emotions']})
+
+        # Stacked bars of the emotions of every month
+        bottom = np.zeros(len(months))
+        for emotion in emotions:
+            counts = np.array([trend[month]['emotions'].get(emotion, 0) for month in months])
+            ax.bar(months, counts, bottom=bottom, label=emotion)
+            bottom += counts
+
+        ax.set_xlabel('Month')
+        ax.set_ylabel('Reviews')
+        ax.set_title(f'Emotions over time for {query.capitalize()}')
+        ax.tick_params(axis='x', labelrotation=90)
+        ax.legend(fontsize=8, loc='upper left')
+
+        # Average rating of the month's reviews
+        ratings = [trend[month]['rating'] for month in months]
+        if any(rating is not None for rating in ratings):
+            rating_ax = ax.twinx()
+            rating_ax.plot(months, [np.nan if rating is None else rating for rating in ratings], color='black', marker='o')
+            rating_ax.set_ylabel('Average rating')
+            rating_ax.set_ylim(1, 5)
+
+        return fig
+
+
     @render.ui
     @reactive.event(input.num_clusters, ignore_none=False)
     def clustering_plot():
-        # Load the CSV data
-        df = pd.read_csv(data_file)
+        import plotly.graph_objects as go
+
+        # Load the restaurants
+        df = repository.restaurants_frame()
 
         # Check if the necessary columns exist
         if 'Distance from Center' not in df.columns or 'Rating' not in df.columns:
             print("Error: Required columns not found in the data.")
             return None  # Return None if the required columns are missing
 
-        # Extract the relevant data for clustering
-        distances = df['Distance from Center']
-        ratings = df['Rating']
-        restaurant_names = df['Name']
-        
         # For emotions, we'll use a simple encoding scheme: map emotions to numerical values
-        with open('./data/reviews_with_emotions_google.json', 'r', encoding='utf-8') as file:
-            reviews_data = json.load(file)
+        reviews_data = repository.review_emotions()
 
-        # Create a mapping of emotions to numerical values
-        emotion_map = {'anger': 1, 'joy': 6, 'sadness': 3, 'neutral': 5, 'surprise': 4, 'disgust': 2}
-        
         # Calculate the average emotion value for each restaurant
-        emotion_values = []
-        for name in restaurant_names:
-            # Get the reviews for the current restaurant
-            restaurant_reviews = [review for review in reviews_data if review['restaurant_name'].lower() == name.lower()]
-            
-            # Calculate the average emotion score for this restaurant
-            if restaurant_reviews:
-                avg_emotion = np.mean([emotion_map.get(review['emotion'], 0) for review in restaurant_reviews])
-            else:
-                avg_emotion = 0  # No reviews, so we assign a default value
-            
-            emotion_values.append(avg_emotion)
-
-        # Add the emotion values to the dataframe
-        df['Emotion'] = emotion_values
+        df = add_emotion_scores(df, reviews_data)
 
         # Remove rows with NaN values in 'Distance from Center', 'Rating', or 'Emotion'
-        df = df.dropna(subset=['Distance from Center', 'Rating', 'Emotion'])
-
-        # Prepare the data for clustering
-        clustering_data = np.array(list(zip(df['Rating'], df['Distance from Center'], df['Emotion'])))
+        df = df.dropna(subset=FEATURES).reset_index(drop=True)
 
-        # Perform KMeans clustering with the number of clusters from the slider
+        # Cluster all the restaurants on the standardized features,
+        # with MiniBatchKMeans once there are too many for full batch KMeans
         num_clusters = input.num_clusters()
-        kmeans = KMeans(n_clusters=num_clusters)  # Use the number of clusters selected by the user
-        df['Cluster'] = kmeans.fit_predict(clustering_data)
+        features = feature_matrix(df)
+        df['Cluster'] = fit_clusters(features, num_clusters)
+        stats = cluster_stats(df, df['Cluster'])
+
+        # Only a bounded, density-aware sample of the points is sent to the browser
+        shown = df.iloc[density_downsample(features)]
 
         # Create the 3D plot using Plotly's graph_objects
         fig = go.Figure()
 
         # Add scatter plot for clustering in 3D
         fig.add_trace(go.Scatter3d(
-            x=df['Distance from Center'],
-            y=df['Rating'],
-            z=df['Emotion'],
+            x=shown['Distance from Center'],
+            y=shown['Rating'],
+            z=shown['Emotion'],
             mode='markers',
-            marker=dict(color=df['Cluster'], colorscale='Viridis', size=10),
-            text=df['Name'],  # Display restaurant names on hover
+            marker=dict(color=shown['Cluster'], colorscale='Viridis', size=10 if len(shown) < 1000 else 3),
+            text=shown['Name'],  # Display restaurant names on hover
             hoverinfo='text'
         ))
 
         # Set the layout for the 3D plot
         fig.update_layout(
-            title=f'3D Clustering of Restaurants Based on Rating, Distance, and Emotions ({num_clusters} Clusters)',
+            title=f'3D Clustering of Restaurants Based on Rating, Distance, and Emotions ({num_clusters} Clusters, '
+                  f'{len(shown)} of {len(df)} restaurants shown)',
             scene=dict(
                 xaxis_title='Distance from City Center (km)',
                 yaxis_title='Restaurant Rating',
@@ -508,8 +472,8 @@ def server(input, output, session):
             showlegend=False
         )
 
-        # Convert Plotly figure to HTML and return it
-        return ui.HTML(fig.to_html(full_html=False))
+        # Convert Plotly figure to HTML and return it, with the statistics of the full clusters
+        return ui.HTML(fig.to_html(full_html=False) + stats.to_html(classes="table table-sm"))
 
 
     
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+# Mapping of emotions to numerical values
+EMOTION_MAP = {'anger': 1, 'joy': 6, 'sadness': 3, 'neutral': 5, 'surprise': 4, 'disgust': 2}
+
+FEATURES = ['Rating', 'Distance from Center', 'Emotion']
+
+# Above this many restaurants the clustering switches to MiniBatchKMeans
+LARGE_DATA_THRESHOLD = 10000
+
+# Upper bound of the points sent to the browser for the 3D view
+MAX_PLOT_POINTS = 5000
+
+
+def add_emotion_scores(df, reviews_data):
+    """
+    Add the average emotion value of the reviews of every restaurant as an 'Emotion' column.
+
+    :param df: DataFrame of the restaurants with a 'Name' column.
+    :param reviews_data: Review entries with restaurant_name and emotion.
+    :return: The DataFrame with the 'Emotion' column, 0 for restaurants without reviews.
+    """
+    reviews = pd.DataFrame(reviews_data, columns=['restaurant_name', 'emotion'])
+    scores = (
+        reviews.assign(name=reviews['restaurant_name'].str.lower(),
+                       value=reviews['emotion'].map(EMOTION_MAP).fillna(0))
+        .groupby('name')['value'].mean()
+    )
+    df['Emotion'] = df['Name'].str.lower().map(scores).fillna(0).to_numpy()
+    return df
+
+
+def feature_matrix(df):
+    """
+    Build the standardized feature matrix of the restaurants.
+
+    :param df: DataFrame with the FEATURES columns and no missing values.
+    :return: Float array of shape (restaurants, features) with zero mean and unit variance columns.
+    """
+    features = df[FEATURES].to_numpy(dtype=np.float64)
+    std = features.std(axis=0)
+    std[std == 0] = 1.0
+    return (features - features.mean(axis=0)) / std
+
+
+def fit_clusters(features, n_clusters, large_data_threshold=LARGE_DATA_THRESHOLD, random_state=0):
+    """
+    Cluster the restaurants, with MiniBatchKMeans when there are too many for full batch KMeans.
+
+    :param features: Standardized feature matrix.
+    :param n_clusters: Number of clusters.
+    :param large_data_threshold: Number of rows above which MiniBatchKMeans is used.
+    :return: Array with the cluster of every row.
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    if len(features) > large_data_threshold:
+        model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=4096, n_init=3, random_state=random_state)
+    else:
+        model = KMeans(n_clusters=n_clusters, n_init=10, random_state=random_state)
+    return model.fit_predict(features)
+
+
+def cluster_stats(df, labels):
+    """
+    Summarize every cluster over all of its restaurants.
+
+    :return: DataFrame with the size and the mean features of every cluster.
+    """
+    grouped = df[FEATURES].groupby(labels)
+    stats = grouped.mean().add_prefix('Mean ')
+    stats.insert(0, 'Restaurants', grouped.size())
+    stats.index.name = 'Cluster'
+    return stats.round(2)
+
+
+def density_downsample(features, max_points=MAX_PLOT_POINTS, grid_size=20, random_state=0):
+    """
+    Pick at most max_points rows, thinning out the dense regions and keeping the sparse ones.
+
+    The feature space is cut into a grid of cells and every cell keeps at most the same
+    number of points, so outliers stay visible while crowded cells are sampled.
+
+    :param features: Standardized feature matrix.
+    :param max_points: Maximum number of rows picked.
+    :param grid_size: Number of cells along each feature.
+    :return: Sorted array of the indices of the picked rows.
+    """
+    n = len(features)
+    if n <= max_points:
+        return np.arange(n)
+
+    # Cell of every point
+    low, high = features.min(axis=0), features.max(axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    coords = np.minimum(((features - low) / span * grid_size).astype(np.int64), grid_size - 1)
+    cells = np.ravel_multi_index(coords.T, (grid_size,) * features.shape[1])
+
+    # Rank of every point inside its cell, in random order
+    order = np.random.default_rng(random_state).permutation(n)
+    order = order[np.argsort(cells[order], kind='stable')]
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    ranks = np.arange(n) - np.repeat(starts, counts)
+
+    # Largest per-cell cap that keeps the total under max_points
+    low_cap, high_cap = 0, counts.max()
+    while low_cap < high_cap:
+        cap = (low_cap + high_cap + 1) // 2
+        if np.minimum(counts, cap).sum() <= max_points:
+            low_cap = cap
+        else:
+            high_cap = cap - 1
+
+    if low_cap == 0:
+        # More occupied cells than points allowed, keep one point of a random subset of the cells
+        rng = np.random.default_rng(random_state)
+        return np.sort(rng.choice(order[starts], max_points, replace=False))
+
+    return np.sort(order[ranks < low_cap])
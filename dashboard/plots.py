@@ -0,0 +1,167 @@
+import os
+import glob
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = './data/.plot_cache'
+
+# Custom bins from 1.0 to 5.1 with a step of 0.1
+RATING_BINS = [x / 10.0 for x in range(10, 52)]
+
+RegressionFit = namedtuple(
+    "RegressionFit",
+    ["distances", "ratings", "slope", "intercept", "grid", "lower", "upper"]
+)
+
+# One lock per rendered chart, so concurrent sessions render it only once
+_render_locks = {}
+_render_locks_guard = threading.Lock()
+
+
+def data_version(path):
+    """
+    Identify the current version of a data file.
+
+    :param path: Path to the data file.
+    :return: A string that changes whenever the file is rewritten.
+    """
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+@lru_cache(maxsize=8)
+def rating_histogram(path, version):
+    """
+    Compute the rating histogram for one version of the restaurants CSV.
+
+    :param path: Path to the restaurants CSV.
+    :param version: Data version from data_version(), part of the cache key.
+    :return: Tuple of (counts, bin edges).
+    """
+    df = pd.read_csv(path, usecols=['Rating'])
+    counts, edges = np.histogram(df['Rating'].dropna(), bins=RATING_BINS)
+    return counts, edges
+
+
+@lru_cache(maxsize=8)
+def distance_rating_regression(path, version):
+    """
+    Fit the distance/rating regression line for one version of the restaurants CSV.
+
+    The 95% confidence band is computed analytically from the least squares fit
+    instead of bootstrapping it like seaborn's regplot does.
+
+    :param path: Path to the restaurants CSV.
+    :param version: Data version from data_version(), part of the cache key.
+    :return: A RegressionFit, or None if the required columns are missing.
+    """
+    try:
+        df = pd.read_csv(path, usecols=['Distance from Center', 'Rating'])
+    except ValueError:
+        return None
+
+    df = df.dropna()
+    distances = df['Distance from Center'].to_numpy(dtype=float)
+    ratings = df['Rating'].to_numpy(dtype=float)
+
+    slope, intercept = np.polyfit(distances, ratings, 1)
+
+    # Confidence band of the fitted mean along the distance range
+    grid = np.linspace(distances.min(), distances.max(), 100)
+    fitted = intercept + slope * grid
+    residuals = ratings - (intercept + slope * distances)
+    sigma = np.sqrt(np.sum(residuals ** 2) / (len(distances) - 2))
+    spread = np.sum((distances - distances.mean()) ** 2)
+    band = 1.96 * sigma * np.sqrt(1 / len(distances) + (grid - distances.mean()) ** 2 / spread)
+
+    return RegressionFit(distances, ratings, slope, intercept, grid, fitted - band, fitted + band)
+
+
+def _draw_rating_histogram(fig, path, version):
+    counts, edges = rating_histogram(path, version)
+    ax = fig.subplots()
+
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', edgecolor='black', alpha=0.7)
+
+    ax.set_xlabel('Rating')
+    ax.set_ylabel('Count')
+    ax.set_title('Distribution of Ratings')
+
+    # Set the x-axis ticks to match the bins (so each rating is clearly labeled)
+    ax.set_xticks(RATING_BINS)
+    ax.set_xticklabels([f'{x:.1f}' for x in RATING_BINS], fontsize=6, rotation=90)
+
+
+def _draw_distance_rating(fig, path, version):
+    fit = distance_rating_regression(path, version)
+    ax = fig.subplots()
+
+    if fit is None:
+        ax.text(0.5, 0.5, 'Required columns not found in the data', ha='center', va='center', fontsize=12)
+        ax.axis('off')
+        return
+
+    ax.scatter(fit.distances, fit.ratings, alpha=0.7, color='blue')
+
+    # Regression line with its confidence band
+    ax.plot(fit.grid, fit.intercept + fit.slope * fit.grid)
+    ax.fill_between(fit.grid, fit.lower, fit.upper, alpha=0.15)
+
+    ax.set_xlabel('Distance from City Center (km)', fontsize=12)
+    ax.set_ylabel('Restaurant Rating', fontsize=12)
+    ax.set_title('Distance vs Restaurant Rating', fontsize=14)
+
+
+_CHARTS = {
+    "rating_histogram": (_draw_rating_histogram, (6.4, 4.8)),
+    "distance_rating": (_draw_distance_rating, (8, 6)),
+}
+
+
+def _render_lock(name):
+    with _render_locks_guard:
+        return _render_locks.setdefault(name, threading.Lock())
+
+
+def chart_image(name, path, cache_dir=CACHE_DIR):
+    """
+    Get the rendered PNG of a dashboard chart for the current version of the data.
+
+    The image is rendered once per data version and shared by every session,
+    older versions of the same chart are removed from the cache directory.
+
+    :param name: Chart name, one of the keys of _CHARTS.
+    :param path: Path to the restaurants CSV.
+    :param cache_dir: Directory holding the rendered images.
+    :return: Path to the PNG file.
+    """
+    draw, figsize = _CHARTS[name]
+    version = data_version(path)
+    image_file = os.path.join(cache_dir, f"{name}-{version}.png")
+
+    with _render_lock(name):
+        if os.path.exists(image_file):
+            return image_file
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+        from matplotlib.figure import Figure
+
+        # Figure objects are not tied to pyplot's global state, so this is safe across sessions
+        fig = Figure(figsize=figsize)
+        draw(fig, path, version)
+        fig.tight_layout()
+
+        tmp_file = image_file + ".tmp"
+        fig.savefig(tmp_file, format="png")
+        os.replace(tmp_file, image_file)
+
+        for stale_file in glob.glob(os.path.join(cache_dir, f"{name}-*.png")):
+            if stale_file != image_file:
+                os.remove(stale_file)
+
+    return image_file
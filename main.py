@@ -1,24 +1,81 @@
+import argparse
+from contextlib import nullcontext
+
 from places_api.restaurants import ClujRestaurants
+from places_api.http_client import QuotaExceededError, estimate_calls
+from places_api.pipeline import RestaurantPipeline, STAGES
+from places_api.repository import RestaurantRepository
+from places_api.inference import EmotionWorkerPool, reclassify_reviews
 from credentials.credentials_provider import get_gplaces_api_key
 
+locations = [
+    "46.770439,23.591423",
+]
+
+locations_long = [
+    "46.770439,23.591423",  # Central Cluj-Napoca
+    "46.785,23.590",        # Slightly north
+    "46.755,23.590",        # Slightly south
+    "46.770,23.630",        # Slightly east
+    "46.760,23.550",        # Slightly west
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Collect the Cluj restaurants, stage by stage.")
+    parser.add_argument("stages", nargs="*", metavar="stage",
+                        help=f"Stages to run, in order (default: all). One of: {', '.join(STAGES)}")
+    parser.add_argument("--long", action="store_true", help="Search around all the locations of locations_long")
+    parser.add_argument("--radius", type=int, default=5000, help="Search radius in meters")
+    parser.add_argument("--checkpoint-dir", default="./data/pipeline", help="Directory of the stage checkpoints")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Classify the reviews on this many worker processes (default: in this process)")
+    parser.add_argument("--reclassify", action="store_true",
+                        help="Classify every review of the reviews JSON again, on the worker processes, and exit")
+    parser.add_argument("--restart", action="store_true", help="Drop the checkpoints of the stages before running them")
+    parser.add_argument("--budget", type=int, help="Stop after this many Places API calls")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Print the Places API calls the search would make, without calling the API, and exit")
+    args = parser.parse_args()
+
+    unknown = [stage for stage in args.stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    return args
+
+
 # Example usage
 if __name__ == "__main__":
+    args = parse_args()
+
+    if args.reclassify:
+        reclassify_reviews(workers=args.workers or None)
+        raise SystemExit
+
+    search_locations = locations_long if args.long else locations
+
+    if args.dry_run:
+        estimate = estimate_calls(search_locations, args.radius)
+        for endpoint, calls in estimate.items():
+            print(f"{endpoint}: up to {calls['max']} calls, about {calls['expected']} expected")
+        raise SystemExit
+
     API_KEY = get_gplaces_api_key()
 
-    locations = [
-        "46.770439,23.591423",
-    ]
-
-    locations_long = [
-        "46.770439,23.591423",  # Central Cluj-Napoca
-        "46.785,23.590",        # Slightly north
-        "46.755,23.590",        # Slightly south
-        "46.770,23.630",        # Slightly east
-        "46.760,23.550",        # Slightly west
-    ]
-    radius = 5000
-
-    cluj_restaurants = ClujRestaurants(api_key=API_KEY, locations=locations, radius=radius)
-    cluj_restaurants.fetch_restaurants()
-    cluj_restaurants.export_to_csv()
+    cluj_restaurants = ClujRestaurants(api_key=API_KEY, locations=search_locations, radius=args.radius,
+                                       call_budget=args.budget, repository=RestaurantRepository())
+
+    with EmotionWorkerPool(args.workers) if args.workers else nullcontext() as pool:
+        pipeline = RestaurantPipeline(cluj_restaurants, checkpoint_dir=args.checkpoint_dir, pool=pool)
+
+        if args.restart:
+            pipeline.reset(args.stages or None)
+
+        try:
+            pipeline.run(args.stages)
+        except KeyboardInterrupt:
+            print("Interrupted, run the same command again to resume from the last completed place")
+        except QuotaExceededError as e:
+            print(f"{e}, run the same command again to resume from the last completed place")
+        print(cluj_restaurants.client.report())
     #cluj_restaurants.print_restaurants_with_reviews()
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+
+ROLLUPS_FILE = "./data/emotion_rollups.json"
+
+
+def rollups_path(json_file):
+    """
+    Get the rollups file kept next to a reviews JSON, ROLLUPS_FILE for the one in ./data.
+    """
+    return os.path.join(os.path.dirname(json_file) or ".", os.path.basename(ROLLUPS_FILE))
+
+
+def review_month(timestamp):
+    """
+    Get the month bucket of a review.
+
+    :param timestamp: Unix time of the review, as given by the Google Places API.
+    :return: The month as 'YYYY-MM'.
+    """
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m")
+
+
+def _review_key(review):
+    text = f"{review['restaurant_name']}\0{review['time']}\0{review['review_text']}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class EmotionRollups:
+    """
+    Monthly emotion counts and rating sums of every restaurant, kept in a JSON file.
+
+    New reviews are added to their month without going through the reviews already counted,
+    the keys of the counted reviews make adding the same review twice a no-op. The keys grow
+    with the history, they are appended to a file of their own and only read when adding reviews,
+    the JSON file the dashboard reads stays as small as the number of restaurant months.
+    """
+
+    def __init__(self, path=ROLLUPS_FILE, keys_path=None):
+        """
+        :param path: The JSON file holding the rollups.
+        :param keys_path: The file holding the keys of the counted reviews (default: path with a .keys extension).
+        """
+        self.path = path
+        self.keys_path = keys_path or os.path.splitext(path)[0] + ".keys"
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        self.restaurants = data.get("restaurants", {})
+        self._seen = None
+        self._replace_keys = False
+        self._new_keys = []
+
+    def _load_seen(self):
+        seen = set()
+        try:
+            with open(self.keys_path, "r", encoding="utf-8") as file:
+                seen.update(line.strip() for line in file)
+        except FileNotFoundError:
+            pass
+        return seen
+
+    def clear(self):
+        """
+        Forget every counted review, e.g. to count them again after they were classified again.
+        The files are replaced on save.
+        """
+        self.restaurants = {}
+        self._seen = set()
+        self._new_keys = []
+        self._replace_keys = True
+
+    def update(self, review_data):
+        """
+        Add reviews to the monthly buckets of their restaurants.
+
+        :param review_data: Review entries with restaurant_name, emotion, time and optionally rating,
+                            entries without a time are skipped.
+        :return: Number of reviews added.
+        """
+        if self._seen is None:
+            self._seen = self._load_seen()
+
+        added = 0
+        for review in review_data:
+            if review.get("time") is None:
+                continue
+
+            name = review["restaurant_name"]
+            key = _review_key(review)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self._new_keys.append(key)
+
+            months = self.restaurants.setdefault(name, {})
+            bucket = months.setdefault(review_month(review["time"]),
+                                       {"reviews": 0, "rated": 0, "rating_sum": 0.0, "emotions": {}})
+            bucket["reviews"] += 1
+            bucket["emotions"][review["emotion"]] = bucket["emotions"].get(review["emotion"], 0) + 1
+            if review.get("rating") is not None:
+                bucket["rated"] += 1
+                bucket["rating_sum"] += review["rating"]
+            added += 1
+        return added
+
+    def save(self):
+        # The keys first: a crash in between leaves reviews uncounted rather than counted twice
+        if self._replace_keys:
+            tmp_file = self.keys_path + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as file:
+                file.write("".join(key + "\n" for key in self._new_keys))
+            os.replace(tmp_file, self.keys_path)
+        elif self._new_keys:
+            with open(self.keys_path, "a", encoding="utf-8") as file:
+                file.write("".join(key + "\n" for key in self._new_keys))
+        self._new_keys = []
+        self._replace_keys = False
+
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as file:
+            json.dump({"restaurants": self.restaurants}, file, ensure_ascii=False)
+        os.replace(tmp_file, self.path)
+
+    def trend(self, query):
+        """
+        Get the monthly emotion counts and average rating of the restaurants matching a query.
+
+        :param query: Lowercase text the restaurant names have to contain.
+        :return: Dict of month -> {"emotions": {emotion: count}, "rating": average rating or None}, sorted by month.
+        """
+        combined = {}
+        for name, months in self.restaurants.items():
+            if query not in name.lower():
+                continue
+            for month, bucket in months.items():
+                total = combined.setdefault(month, {"emotions": {}, "rated": 0, "rating_sum": 0.0})
+                for emotion, count in bucket["emotions"].items():
+                    total["emotions"][emotion] = total["emotions"].get(emotion, 0) + count
+                total["rated"] += bucket["rated"]
+                total["rating_sum"] += bucket["rating_sum"]
+
+        return {
+            month: {
+                "emotions": total["emotions"],
+                "rating": total["rating_sum"] / total["rated"] if total["rated"] else None
+            }
+            for month, total in sorted(combined.items())
+        }
+
+
+def _version(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@lru_cache(maxsize=4)
+def _load_rollups(path, version):
+    # The version (mtime, size) is part of the cache key, so a rewritten file is reloaded
+    return EmotionRollups(path)
+
+
+def emotion_trend(query, path=ROLLUPS_FILE):
+    """
+    Get the monthly emotion trend of the restaurants matching a query, see EmotionRollups.trend.
+
+    The rollups file is parsed once per version, not on every search.
+    """
+    version = _version(path)
+    if version is None:
+        return {}
+    return _load_rollups(path, version).trend(query)
+
+
+# path -> (version of the file when last saved, EmotionRollups), reused while nobody else writes the file
+_writers = {}
+
+
+def update_rollups(review_data, path=ROLLUPS_FILE):
+    """
+    Add newly stored reviews to the rollups file.
+
+    Called once per restaurant during a fetch, the rollups and their keys are loaded once
+    and kept until the file is changed by someone else.
+    """
+    version, rollups = _writers.get(path, (None, None))
+    if rollups is None or version is None or version != _version(path):
+        rollups = EmotionRollups(path)
+    if rollups.update(review_data):
+        rollups.save()
+    _writers[path] = (_version(path), rollups)
+
+
+def rebuild_rollups(review_data, path=ROLLUPS_FILE):
+    """
+    Count all the reviews again, replacing the rollups file.
+
+    :param review_data: Every stored review, e.g. the reviews JSON after the reviews were classified again.
+    """
+    rollups = EmotionRollups(path)
+    rollups.clear()
+    rollups.update(review_data)
+    rollups.save()
+    _writers[path] = (_version(path), rollups)
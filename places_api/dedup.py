@@ -0,0 +1,191 @@
+import hashlib
+import json
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+_PRIME = (1 << 31) - 1
+
+
+def normalize_text(text):
+    """
+    Normalize a review text so trivially different copies compare equal.
+    """
+    return re.sub(r"\W+", " ", text.lower()).strip()
+
+
+class ReviewDeduplicator:
+    """
+    Detect exact and near duplicate review texts with MinHash and locality sensitive hashing.
+
+    Every distinct text is classified once, identical copies reuse the classification. A small
+    edit can flip the sentiment ("loved" and "hated" differ by a few characters), so slightly
+    edited copies are classified again. A copy, identical or slightly edited, is skipped only
+    when it is the same review again: at the same restaurant, by the same author at the same time.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.8, shingle_size=5, seed=1):
+        """
+        :param num_perm: Number of MinHash permutations.
+        :param bands: Number of LSH bands, num_perm must be a multiple of it.
+        :param threshold: Minimum estimated Jaccard similarity of two near duplicates.
+        :param shingle_size: Length of the character shingles.
+        :param seed: Seed of the MinHash permutations.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+
+        self._exact = {}  # text digest -> entry
+        self._buckets = defaultdict(list)  # (band, band hash) -> entries
+        self._signatures = []
+        self._classifications = []
+        self._copies = []  # entry -> {restaurant name: [(author, time) of the stored copies]}
+
+        self.reviews = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.skipped_reviews = 0
+        self.skipped_bytes = 0
+
+    def _signature(self, text):
+        size = self.shingle_size
+        shingles = {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles)) % _PRIME
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def _find(self, text):
+        """
+        Find the entry of an identical or near duplicate text.
+
+        :return: Tuple of (entry, digest, signature), entry is None for a new text.
+        """
+        normalized = normalize_text(text)
+        digest = hashlib.sha1(normalized.encode("utf-8")).digest()
+        if digest in self._exact:
+            return self._exact[digest], digest, None
+
+        signature = self._signature(normalized)
+        candidates = {entry for key in self._band_keys(signature) for entry in self._buckets.get(key, ())}
+        best, best_similarity = None, self.threshold
+        for entry in candidates:
+            similarity = np.mean(self._signatures[entry] == signature)
+            if similarity >= best_similarity:
+                best, best_similarity = entry, similarity
+        return best, digest, signature
+
+    def _add(self, digest, signature, classification):
+        entry = len(self._classifications)
+        self._exact[digest] = entry
+        self._signatures.append(signature)
+        self._classifications.append(classification)
+        self._copies.append(defaultdict(list))
+        for key in self._band_keys(signature):
+            self._buckets[key].append(entry)
+        return entry
+
+    def _remember(self, entry, restaurant_name, author, time):
+        """
+        Record a stored copy of a text.
+
+        :return: True when the same review was stored before. An author or time that is
+                 not known matches any, reviews without either are told apart by text only.
+        """
+        copies = self._copies[entry][restaurant_name]
+        seen = any((author is None or other_author is None or author == other_author)
+                   and (time is None or other_time is None or time == other_time)
+                   for other_author, other_time in copies)
+        if not seen:
+            copies.append((author, time))
+        return seen
+
+    def lookup(self, text):
+        """
+        Get the classification of an identical text, without recording anything.
+
+        :param text: The review text.
+        :return: Tuple of (emotion, confidence), None for a text to classify.
+        """
+        entry, _, signature = self._find(text)
+        return None if entry is None or signature is not None else self._classifications[entry]
+
+    def resolve(self, restaurant_name, text, classify, author=None, time=None):
+        """
+        Classify a review text, reusing the classification of an identical copy.
+
+        :param restaurant_name: Name of the restaurant the review belongs to.
+        :param text: The review text.
+        :param classify: Function returning (emotion, confidence) for a new text.
+        :param author: Name of the author of the review (optional).
+        :param time: Time of the review (optional).
+        :return: Tuple of (emotion, confidence, is_duplicate), is_duplicate is True when
+                 the same review, possibly slightly edited, is already stored for this restaurant.
+        """
+        self.reviews += 1
+        entry, digest, signature = self._find(text)
+
+        if signature is None:
+            self.exact_hits += 1
+            is_duplicate = self._remember(entry, restaurant_name, author, time)
+        else:
+            near = entry
+            entry = self._add(digest, signature, classify(text))
+            is_duplicate = self._remember(entry, restaurant_name, author, time)
+            if near is not None:
+                self.near_hits += 1
+                is_duplicate = self._remember(near, restaurant_name, author, time)
+
+        if is_duplicate:
+            self.skipped_reviews += 1
+            self.skipped_bytes += len(text.encode("utf-8"))
+
+        emotion, confidence = self._classifications[entry]
+        return emotion, confidence, is_duplicate
+
+    def seed(self, review_data):
+        """
+        Register already classified reviews without counting them in the statistics.
+
+        :param review_data: Review entries with restaurant_name, review_text, emotion and confidence,
+                            and author_name and time when known.
+        """
+        for review in review_data:
+            identity = (review["restaurant_name"], review.get("author_name"), review.get("time"))
+            entry, digest, signature = self._find(review["review_text"])
+            if signature is not None:
+                if entry is not None:
+                    self._remember(entry, *identity)
+                entry = self._add(digest, signature, (review["emotion"], review["confidence"]))
+            self._remember(entry, *identity)
+
+    def seed_from_json(self, json_file):
+        """
+        Register the reviews of a JSON file like ./data/reviews_with_emotions_google.json.
+        """
+        try:
+            with open(json_file, "r", encoding="utf-8") as file:
+                self.seed(json.load(file))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def report(self):
+        """
+        Summarize how much inference and storage the deduplication saved.
+        """
+        return (f"Reviews: {self.reviews}, classifier calls saved by exact duplicates: {self.exact_hits}, "
+                f"near duplicates: {self.near_hits}, "
+                f"duplicates not stored: {self.skipped_reviews} ({self.skipped_bytes / 1024:.1f} KB)")
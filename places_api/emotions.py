@@ -0,0 +1,80 @@
+from functools import lru_cache
+
+EMOTION_MODEL = 'j-hartmann/emotion-english-distilroberta-base'
+
+# The model only looks at the beginning of long reviews
+MAX_REVIEW_CHARS = 512
+
+
+@lru_cache(maxsize=None)
+def get_emotion_analyzer():
+    """
+    Load the emotion classification pipeline, once per process.
+
+    :return: The transformers text-classification pipeline.
+    """
+    # transformers (and torch) take seconds to import, only pay for it when classifying
+    from transformers import pipeline
+
+    return pipeline('text-classification', model=EMOTION_MODEL)
+
+
+def classify_emotion(text):
+    """
+    Classify the dominant emotion of a review text.
+
+    :param text: The review text.
+    :return: Tuple of (emotion, confidence).
+    """
+    emotion_results = get_emotion_analyzer()(text[:MAX_REVIEW_CHARS])
+    if emotion_results:
+        return emotion_results[0]['label'], emotion_results[0]['score']
+    return "Unknown", 0.0
+
+
+def tag_reviews(restaurant_name, texts, source=None, deduplicator=None, classify=classify_emotion, fields=None):
+    """
+    Tag the reviews of a restaurant with their emotions.
+
+    This is the shared emotion tagging stage for every review source, the entries
+    have the format of ./data/reviews_with_emotions_google.json.
+
+    :param restaurant_name: Name of the restaurant the reviews belong to.
+    :param texts: The review texts, empty ones are skipped.
+    :param source: Name of the review source, recorded when given (e.g. 'tripadvisor').
+    :param deduplicator: ReviewDeduplicator reusing the emotions of duplicate texts and leaving
+                         out the reviews already stored for the restaurant, told apart by the
+                         author_name and time of their fields (optional).
+    :param classify: Function returning (emotion, confidence) for a text, e.g. a lookup in
+                     results computed by an EmotionWorkerPool.
+    :param fields: Dicts of extra fields stored with the reviews, e.g. their time and rating,
+                   in the order of the texts (optional).
+    :return: List of review entries with emotions.
+    """
+    review_data = []
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+
+        if deduplicator is None:
+            emotion, confidence = classify(text)
+        else:
+            review_fields = fields[i] if fields is not None else {}
+            emotion, confidence, is_duplicate = deduplicator.resolve(
+                restaurant_name, text, classify, review_fields.get("author_name"), review_fields.get("time"))
+            if is_duplicate:
+                continue
+
+        review_entry = {
+            "restaurant_name": restaurant_name,
+            "review_text": text,
+            "emotion": emotion,
+            "confidence": confidence
+        }
+        if fields is not None:
+            review_entry.update(fields[i])
+        if source is not None:
+            review_entry["source"] = source
+        review_data.append(review_entry)
+
+    return review_data
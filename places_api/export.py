@@ -0,0 +1,77 @@
+import csv
+import os
+
+RESTAURANTS_CSV = "./data/google_restaurants.csv"
+REVIEWS_CSV = "./data/google_reviews.csv"
+
+RESTAURANT_COLUMNS = ["Name", "Address", "Rating", "Place ID", "Distance from Center"]
+REVIEW_COLUMNS = ["Place ID", "Author", "Time", "Rating", "Review"]
+
+
+class CsvExportSink:
+    """
+    Write the restaurants and their reviews to two CSV files while they are being fetched.
+
+    Rows go to '<file>.part' files flushed every few restaurants, so partial results can be
+    looked at during a long fetch. Closing the sink renames them over the final files at once,
+    an interrupted run leaves the previous complete files untouched.
+    """
+
+    def __init__(self, restaurants_csv=RESTAURANTS_CSV, reviews_csv=REVIEWS_CSV, flush_every=20):
+        """
+        :param restaurants_csv: The CSV file of the restaurants, one row per place.
+        :param reviews_csv: The CSV file of the reviews, one row per review.
+        :param flush_every: Number of restaurants written between two flushes.
+        """
+        self.restaurants_csv = restaurants_csv
+        self.reviews_csv = reviews_csv
+        self.flush_every = flush_every
+        self.written = 0
+        self._files = []
+
+    def open(self):
+        for path, columns in ((self.restaurants_csv, RESTAURANT_COLUMNS), (self.reviews_csv, REVIEW_COLUMNS)):
+            file = open(path + ".part", mode='w', newline='', encoding='utf-8')
+            csv.writer(file).writerow(columns)
+            self._files.append(file)
+        self._restaurant_writer = csv.writer(self._files[0])
+        self._review_writer = csv.writer(self._files[1])
+        return self
+
+    def write(self, restaurant):
+        """
+        Write the row of a restaurant and the rows of its reviews.
+
+        :param restaurant: A Restaurant or RestaurantRow.
+        """
+        self._restaurant_writer.writerow([restaurant.name, restaurant.address, restaurant.rating,
+                                          restaurant.place_id, restaurant.distance_from_city_center])
+        for review in restaurant.reviews:
+            self._review_writer.writerow([restaurant.place_id, review.get('author_name', ''), review.get('time'),
+                                          review.get('rating'), review.get('text', '')])
+
+        self.written += 1
+        if self.written % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        for file in self._files:
+            file.flush()
+
+    def close(self, commit=True):
+        """
+        Close the files, replacing the final files with them when commit is True.
+        """
+        for file in self._files:
+            file.close()
+        self._files = []
+
+        if commit:
+            os.replace(self.restaurants_csv + ".part", self.restaurants_csv)
+            os.replace(self.reviews_csv + ".part", self.reviews_csv)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(commit=exc_type is None)
@@ -0,0 +1,222 @@
+import math
+import random
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_URL = "https://maps.googleapis.com/maps/api/place"
+ENDPOINTS = ("nearbysearch", "details")
+
+# A Nearby Search returns at most 3 pages of 20 results
+MAX_PAGES = 3
+RESULTS_PER_PAGE = 20
+
+# Statuses worth retrying: the quota refills, the server recovers
+RETRY_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+RETRY_HTTP_CODES = {429, 500, 502, 503, 504}
+
+# Statuses of a Place Details call concerning that place only: it was removed or its id is no longer valid
+MISSING_PLACE_STATUSES = {"NOT_FOUND", "INVALID_REQUEST"}
+
+
+class PlacesApiError(RuntimeError):
+
+    def __init__(self, message, status=None):
+        """
+        :param message: Description of the failure.
+        :param status: Status of the API response, None if the call was not made.
+        """
+        super().__init__(message)
+        self.status = status
+
+
+class QuotaExceededError(PlacesApiError):
+    pass
+
+
+class PlacesClient:
+    """
+    Client of the Google Places API sharing one pooled keep-alive session.
+
+    Failed calls are retried with exponential backoff and jitter, every call is counted
+    per endpoint against an optional budget.
+    """
+
+    def __init__(self, api_key, budget=None, max_retries=5, backoff=1.0, max_backoff=30.0,
+                 pool_size=10, timeout=30):
+        """
+        :param api_key: Google Places API key.
+        :param budget: Maximum number of calls, an int for all endpoints together or a dict per endpoint (optional).
+        :param max_retries: Number of retries of a failed call.
+        :param backoff: Base delay of the retries in seconds, doubled after every retry.
+        :param max_backoff: Maximum delay between two retries in seconds.
+        :param pool_size: Number of connections kept alive.
+        :param timeout: Timeout of a request in seconds.
+        """
+        self.api_key = api_key
+        self.budget = budget
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+
+        self.calls = Counter()
+        self.retries = Counter()
+        self.missing_places = []
+        self._lock = threading.Lock()
+
+    def _reserve_call(self, endpoint):
+        with self._lock:
+            if isinstance(self.budget, dict):
+                limit, used = self.budget.get(endpoint), self.calls[endpoint]
+            else:
+                limit, used = self.budget, sum(self.calls.values())
+            if limit is not None and used >= limit:
+                raise QuotaExceededError(f"Call budget of {limit} exhausted by {endpoint}")
+            self.calls[endpoint] += 1
+
+    def _sleep_before_retry(self, endpoint, attempt, reason):
+        with self._lock:
+            self.retries[endpoint] += 1
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        print(f"Retrying {endpoint} in {delay:.1f}s ({reason})")
+        time.sleep(delay)
+
+    def get(self, endpoint, **params):
+        """
+        Call an endpoint, retrying on network errors, 5xx and retryable API statuses.
+
+        :param endpoint: One of ENDPOINTS.
+        :param params: Query parameters, the API key is added.
+        :return: The decoded JSON response.
+        """
+        url = f"{BASE_URL}/{endpoint}/json"
+        params["key"] = self.api_key
+
+        for attempt in range(self.max_retries + 1):
+            self._reserve_call(endpoint)
+            last_attempt = attempt == self.max_retries
+
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_attempt:
+                    raise
+                self._sleep_before_retry(endpoint, attempt, e.__class__.__name__)
+                continue
+
+            if response.status_code in RETRY_HTTP_CODES and not last_attempt:
+                self._sleep_before_retry(endpoint, attempt, f"HTTP {response.status_code}")
+                continue
+            response.raise_for_status()
+
+            data = response.json()
+            status = data.get("status", "OK")
+            if status in ("OK", "ZERO_RESULTS"):
+                return data
+            # A page token used too early is rejected as INVALID_REQUEST until it becomes valid
+            retryable = status in RETRY_STATUSES or (status == "INVALID_REQUEST" and "pagetoken" in params)
+            if retryable and not last_attempt:
+                self._sleep_before_retry(endpoint, attempt, status)
+                continue
+            raise PlacesApiError(f"{endpoint} failed with {status}: {data.get('error_message', '')}", status)
+
+    def nearby_search(self, location, radius, place_type):
+        return self.get("nearbysearch", location=location, radius=radius, type=place_type)
+
+    def next_page(self, page_token):
+        return self.get("nearbysearch", pagetoken=page_token)
+
+    def place_details(self, place_id):
+        """
+        Get the details of a place.
+
+        A place that was removed since it was found fails alone, it is recorded in missing_places
+        and an empty result is returned instead of stopping the whole fetch.
+        """
+        try:
+            return self.get("details", placeid=place_id)
+        except PlacesApiError as e:
+            if e.status not in MISSING_PLACE_STATUSES:
+                raise
+            print(f"Skipping place {place_id}: {e}")
+            with self._lock:
+                self.missing_places.append(place_id)
+            return {"status": e.status, "result": {}}
+
+    def report(self):
+        """
+        Summarize the calls made per endpoint.
+        """
+        calls = ", ".join(f"{endpoint}: {self.calls[endpoint]}" for endpoint in ENDPOINTS)
+        retries = sum(self.retries.values())
+        summary = f"Places API calls - {calls} (total {sum(self.calls.values())}, of which {retries} retries)"
+        if self.missing_places:
+            summary += f", {len(self.missing_places)} places not found: {', '.join(self.missing_places)}"
+        return summary
+
+
+@lru_cache(maxsize=None)
+def get_client(api_key):
+    """
+    Get the PlacesClient shared by everything using the same API key.
+    """
+    return PlacesClient(api_key)
+
+
+def _union_area_fraction(centers, radius_km, grid=200):
+    """
+    Estimate the area covered by overlapping circles, as a number of circle areas.
+    """
+    xs = [x for x, _ in centers]
+    ys = [y for _, y in centers]
+    x_grid = [min(xs) - radius_km + (max(xs) - min(xs) + 2 * radius_km) * (i + 0.5) / grid for i in range(grid)]
+    y_grid = [min(ys) - radius_km + (max(ys) - min(ys) + 2 * radius_km) * (j + 0.5) / grid for j in range(grid)]
+    cell_area = (x_grid[1] - x_grid[0] if grid > 1 else 2 * radius_km) * (y_grid[1] - y_grid[0] if grid > 1 else 2 * radius_km)
+
+    covered = sum(
+        1 for x in x_grid for y in y_grid
+        if any((x - cx) ** 2 + (y - cy) ** 2 <= radius_km ** 2 for cx, cy in centers)
+    )
+    return covered * cell_area / (math.pi * radius_km ** 2)
+
+
+def estimate_calls(locations, radius):
+    """
+    Estimate the Places API calls a fetch will make, without calling the API.
+
+    Every search returns at most 60 places in 3 pages and every unique place costs one
+    Place Details call. Overlapping search circles find the same places, the expected number
+    of unique places scales with the area the circles cover together.
+
+    :param locations: List of location coordinates (latitude, longitude) as strings.
+    :param radius: Search radius in meters.
+    :return: Dict with the maximum and expected calls per endpoint and in total.
+    """
+    coordinates = [tuple(map(float, location.split(","))) for location in locations]
+    lat0 = sum(lat for lat, _ in coordinates) / len(coordinates)
+
+    # Equirectangular projection, good enough at city scale
+    centers = [(lng * 111.32 * math.cos(math.radians(lat0)), lat * 110.57) for lat, lng in coordinates]
+    coverage = _union_area_fraction(centers, radius / 1000)
+
+    max_places = MAX_PAGES * RESULTS_PER_PAGE * len(locations)
+    expected_places = min(max_places, round(MAX_PAGES * RESULTS_PER_PAGE * coverage))
+
+    estimate = {
+        "nearbysearch": {"max": MAX_PAGES * len(locations), "expected": MAX_PAGES * len(locations)},
+        "details": {"max": max_places, "expected": expected_places},
+    }
+    estimate["total"] = {
+        "max": sum(calls["max"] for calls in estimate.values()),
+        "expected": sum(calls["expected"] for calls in estimate.values()),
+    }
+    return estimate
@@ -0,0 +1,127 @@
+import json
+import multiprocessing
+import os
+import signal
+
+from places_api.aggregates import ROLLUPS_FILE, rebuild_rollups
+from places_api.emotions import MAX_REVIEW_CHARS, get_emotion_analyzer
+
+
+def _init_worker(intra_op_threads):
+    """
+    Load the model once in a worker process, with its share of the cores.
+    """
+    # Ctrl-C reaches the whole process group, only the parent handles it and stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        import torch
+        torch.set_num_threads(intra_op_threads)
+    except ImportError:
+        pass
+    get_emotion_analyzer()
+
+
+def _classify_batch(texts):
+    emotion_results = get_emotion_analyzer()([text[:MAX_REVIEW_CHARS] for text in texts], batch_size=len(texts))
+    return [(result['label'], result['score']) for result in emotion_results]
+
+
+class EmotionWorkerPool:
+    """
+    Pool of worker processes running the emotion classifier.
+
+    Batches of texts are put on the pool's task queue and picked up by whichever worker
+    is free, the results come back in the order of the texts.
+    """
+
+    def __init__(self, workers=None, intra_op_threads=None, batch_size=16):
+        """
+        Initialize the pool, the workers are started on enter.
+
+        :param workers: Number of worker processes (default: half of the cores).
+        :param intra_op_threads: Threads used by each worker (default: the cores divided between the workers).
+        :param batch_size: Number of texts a worker classifies at once.
+        """
+        cores = os.cpu_count() or 1
+        self.workers = workers or max(1, cores // 2)
+        self.intra_op_threads = intra_op_threads or max(1, cores // self.workers)
+        self.batch_size = batch_size
+        self._pool = None
+
+    def __enter__(self):
+        # Spawned workers do not inherit the state of the parent's torch runtime
+        context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(self.workers, initializer=_init_worker, initargs=(self.intra_op_threads,))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._pool.close()
+        else:
+            # Interrupted or failed: the pending batches would never be collected, close() and join() would hang
+            self._pool.terminate()
+        self._pool.join()
+        self._pool = None
+
+    def classify(self, texts):
+        """
+        Classify the emotions of the texts on the workers.
+
+        :param texts: List of review texts.
+        :return: List of (emotion, confidence), in the order of the texts.
+        """
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = []
+        for batch_results in self._pool.imap(_classify_batch, batches):
+            results.extend(batch_results)
+        return results
+
+    def classify_new(self, texts, deduplicator=None):
+        """
+        Classify the distinct texts the deduplicator does not know yet.
+
+        :param texts: List of review texts, empty ones are skipped.
+        :param deduplicator: ReviewDeduplicator whose known texts are not classified again (optional).
+        :return: Dict of text -> (emotion, confidence), to be passed as tag_reviews(classify=...).__getitem__.
+        """
+        new_texts = list(dict.fromkeys(
+            text for text in texts
+            if text and (deduplicator is None or deduplicator.lookup(text) is None)
+        ))
+        return dict(zip(new_texts, self.classify(new_texts)))
+
+
+def reclassify_reviews(json_file="./data/reviews_with_emotions_google.json", workers=None, repository=None,
+                       rollups_file=ROLLUPS_FILE):
+    """
+    Classify the emotions of every review of the JSON file again, e.g. after a model change.
+
+    The restaurant repository and the monthly rollups the dashboard reads are updated too.
+
+    :param json_file: The JSON file with the reviews and their emotions.
+    :param workers: Number of worker processes.
+    :param repository: RestaurantRepository holding the reviews (default: the one in ./data).
+    :param rollups_file: The monthly emotion rollups, counted again.
+    """
+    from places_api.repository import RestaurantRepository
+
+    with open(json_file, "r", encoding="utf-8") as file:
+        review_data = json.load(file)
+
+    texts = list(dict.fromkeys(review["review_text"] for review in review_data))
+    with EmotionWorkerPool(workers) as pool:
+        print(f"Reclassifying {len(texts)} distinct reviews on {pool.workers} workers")
+        emotions = dict(zip(texts, pool.classify(texts)))
+
+    for review in review_data:
+        review["emotion"], review["confidence"] = emotions[review["review_text"]]
+
+    tmp_file = json_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as file:
+        json.dump(review_data, file, ensure_ascii=False, indent=4)
+    os.replace(tmp_file, json_file)
+
+    if repository is None:
+        repository = RestaurantRepository()
+    repository.update_emotions(review_data)
+    rebuild_rollups(review_data, rollups_file)
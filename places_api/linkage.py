@@ -0,0 +1,192 @@
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+import pandas as pd
+
+MATCHES_CSV = "./data/employee_matches.csv"
+
+# Words that say what kind of place it is or where it is, not which one
+NAME_STOPWORDS = {
+    "restaurant", "restaurante", "restaurantul", "cafe", "caffe", "bistro", "the", "and", "si",
+    "srl", "sa", "s", "r", "l", "cluj", "napoca", "by", "de", "la"
+}
+ADDRESS_STOPWORDS = {
+    "strada", "str", "nr", "bulevardul", "bd", "calea", "piata", "cluj", "napoca", "romania", "jud", "judetul"
+}
+
+# Tokens shared by more records than this are too common to narrow down the candidates
+MAX_BLOCK_SIZE = 50
+
+MATCH_COLUMNS = ["Place ID", "Name", "Matched Name", "Employees", "Score"]
+
+
+def _tokens(text, stopwords):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii").lower()
+    return [token for token in re.split(r"[^a-z0-9]+", text) if token and token not in stopwords]
+
+
+def normalize_name(name):
+    """
+    Normalize a restaurant or company name for matching.
+
+    :param name: The name, e.g. 'Café Bulgakov' or 'BULGAKOV CAFE S.R.L.'.
+    :return: Lowercase ascii name without punctuation and generic words, e.g. 'bulgakov'.
+    """
+    if not isinstance(name, str):
+        return ""
+    return " ".join(_tokens(name, NAME_STOPWORDS))
+
+
+def address_tokens(address):
+    """
+    Get the distinctive tokens of an address (street name and number).
+    """
+    if not isinstance(address, str):
+        return set()
+    return set(_tokens(address, ADDRESS_STOPWORDS))
+
+
+def score_pair(name, other_name, address=None, other_address=None):
+    """
+    Score how likely two records are the same restaurant.
+
+    :param name: Normalized name of the first record.
+    :param other_name: Normalized name of the second record.
+    :param address: Address tokens of the first record (optional).
+    :param other_address: Address tokens of the second record (optional).
+    :return: Score between 0 and 1.
+    """
+    if not name or not other_name:
+        return 0.0
+
+    tokens, other_tokens = set(name.split()), set(other_name.split())
+    jaccard = len(tokens & other_tokens) / len(tokens | other_tokens)
+    sequence = SequenceMatcher(None, name, other_name).ratio()
+    name_score = max(jaccard, sequence)
+
+    if address and other_address:
+        address_score = len(address & other_address) / min(len(address), len(other_address))
+        return 0.8 * name_score + 0.2 * address_score
+    return name_score
+
+
+class BlockingIndex:
+    """
+    Inverted index from name tokens to employee records, so every restaurant is only
+    compared with the records sharing a token with it instead of with all of them.
+    """
+
+    def __init__(self, records):
+        """
+        :param records: List of (normalized names, address tokens) of the employee records.
+        """
+        self.records = records
+        self._blocks = defaultdict(set)
+        for i, (names, _) in enumerate(records):
+            for name in names:
+                for token in name.split():
+                    self._blocks[token].add(i)
+
+    def candidates(self, name):
+        """
+        Get the records sharing a distinctive token with a normalized name.
+        """
+        candidates = set()
+        for token in name.split():
+            block = self._blocks.get(token, ())
+            if len(block) <= MAX_BLOCK_SIZE:
+                candidates.update(block)
+        return candidates
+
+
+def link_employees(restaurant_data, employee_data, threshold=0.6):
+    """
+    Match the restaurants with the scraped employee data, one to one.
+
+    The scraper searched every restaurant by its own name, so that name only tells which records
+    to compare with it. The score is computed on the company name and address Listafirme shows,
+    records without a company or a numeric number of employees, like failed scrapes, are left out.
+    The best scoring pairs are matched first and every record goes to one restaurant at most.
+    A record scoring the same for several restaurants, e.g. branches of a chain without an
+    address to tell them apart, is left unmatched.
+
+    :param restaurant_data: DataFrame with Name, Address and Place ID columns.
+    :param employee_data: DataFrame with Name, Company, Address and Employees columns.
+    :param threshold: Minimum score of a match.
+    :return: DataFrame with the MATCH_COLUMNS, in the order of the restaurants.
+    """
+    if "Company" not in employee_data.columns:
+        return pd.DataFrame([], columns=MATCH_COLUMNS)
+    employees = pd.to_numeric(employee_data["Employees"], errors="coerce")
+    employee_data = employee_data[employees.notna() & employee_data["Company"].map(normalize_name).astype(bool)]
+    employee_data = employee_data.reset_index(drop=True)
+
+    records = []  # (normalized company, address tokens)
+    searched = []  # (names the record is found by, address tokens)
+    for _, row in employee_data.iterrows():
+        company = normalize_name(row["Company"])
+        records.append((company, address_tokens(row.get("Address"))))
+        searched.append(({normalize_name(row["Name"]), company} - {""}, records[-1][1]))
+    index = BlockingIndex(searched)
+
+    # Scores of every (restaurant, record) pair above the threshold
+    scores = defaultdict(dict)  # record -> {restaurant position: score}
+    for position, (_, restaurant) in enumerate(restaurant_data.iterrows()):
+        name = normalize_name(restaurant["Name"])
+        address = address_tokens(restaurant.get("Address"))
+        for i in index.candidates(name):
+            company, other_address = records[i]
+            score = score_pair(name, company, address, other_address)
+            if score >= threshold:
+                scores[i][position] = score
+
+    pairs = sorted(((score, position, i) for i, candidates in scores.items() for position, score in candidates.items()),
+                   key=lambda pair: (-pair[0], pair[1], pair[2]))
+    assigned = {}  # restaurant position -> (record, score)
+    used = set()
+    for score, position, i in pairs:
+        if position in assigned or i in used:
+            continue
+        used.add(i)
+        tied = [other for other, other_score in scores[i].items()
+                if other != position and other not in assigned and other_score == score]
+        if not tied:
+            assigned[position] = (i, score)
+
+    matches = []
+    for position, (i, score) in sorted(assigned.items()):
+        restaurant = restaurant_data.iloc[position]
+        employee = employee_data.iloc[i]
+        matches.append([restaurant["Place ID"], restaurant["Name"], employee["Company"],
+                        employee["Employees"], round(score, 3)])
+
+    return pd.DataFrame(matches, columns=MATCH_COLUMNS)
+
+
+@lru_cache(maxsize=4)
+def _load_matches(path, version):
+    # The version (mtime, size) is part of the cache key, so a rewritten table is reloaded
+    return pd.read_csv(path, dtype={"Employees": str}).set_index("Place ID")
+
+
+def employee_count(place_id, matches_csv=MATCHES_CSV):
+    """
+    Look up the number of employees of a restaurant in the match table.
+
+    :param place_id: Google Places place_id of the restaurant.
+    :param matches_csv: The match table written by link_employees.
+    :return: The number of employees as scraped (None if the restaurant is not matched).
+    """
+    try:
+        stat = os.stat(matches_csv)
+    except FileNotFoundError:
+        return None
+    matches = _load_matches(matches_csv, (stat.st_mtime_ns, stat.st_size))
+
+    if place_id not in matches.index:
+        return None
+    return matches.loc[[place_id], "Employees"].iloc[0]
@@ -0,0 +1,320 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from places_api.aggregates import ROLLUPS_FILE, update_rollups
+from places_api.dedup import ReviewDeduplicator
+from places_api.export import RESTAURANTS_CSV, REVIEWS_CSV
+from places_api.linkage import MATCHES_CSV, link_employees
+from places_api.restaurants import Restaurant, haversine_distance, review_fields
+from places_api.table import RestaurantTable
+
+STAGES = ["discover", "details", "classify", "distance", "scrape", "export"]
+
+
+class Checkpoint:
+    """
+    Append-only JSON lines file holding one record per completed unit of a stage.
+    """
+
+    def __init__(self, path, key):
+        """
+        :param path: Path to the JSON lines file.
+        :param key: Name of the record field identifying the unit (e.g. 'place_id').
+        """
+        self.path = path
+        self.key = key
+
+    def load(self):
+        """
+        Load the completed units.
+
+        :return: Dict of unit key -> record, the last record wins.
+        """
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by an interrupted run, the unit is redone
+                    continue
+                records[record[self.key]] = record
+        return records
+
+    def append(self, record):
+        """
+        Record a completed unit, flushed to disk right away.
+
+        :param record: The output of the unit, containing the key field.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class RestaurantPipeline:
+
+    def __init__(self, cluj_restaurants, checkpoint_dir="./data/pipeline",
+                 csv_file=RESTAURANTS_CSV, reviews_csv=REVIEWS_CSV,
+                 json_file="./data/reviews_with_emotions_google.json",
+                 employee_csv="./data/employee_data.csv",
+                 matches_csv=MATCHES_CSV, rollups_file=ROLLUPS_FILE, pool=None):
+        """
+        Initialize the staged pipeline.
+
+        Every stage reads the checkpoints of the stages before it and writes its own,
+        one record per place, so an interrupted run resumes from the last completed place.
+
+        :param cluj_restaurants: ClujRestaurants instance holding the API key, locations and radius.
+        :param checkpoint_dir: Directory of the stage checkpoints.
+        :param csv_file: The restaurants CSV written by the export stage.
+        :param reviews_csv: The reviews CSV written by the export stage.
+        :param json_file: The reviews JSON written by the export stage.
+        :param employee_csv: The employee CSV written by the export stage.
+        :param matches_csv: The match table between restaurants and employee data written by the export stage.
+        :param rollups_file: The monthly emotion rollups updated by the export stage.
+        :param pool: EmotionWorkerPool used by the classify stage (optional).
+        """
+        self.cluj_restaurants = cluj_restaurants
+        self.checkpoint_dir = checkpoint_dir
+        self.csv_file = csv_file
+        self.reviews_csv = reviews_csv
+        self.json_file = json_file
+        self.employee_csv = employee_csv
+        self.matches_csv = matches_csv
+        self.rollups_file = rollups_file
+        self.pool = pool
+
+    def checkpoint(self, stage):
+        key = "location" if stage == "discover" else "place_id"
+        return Checkpoint(os.path.join(self.checkpoint_dir, f"{stage}.jsonl"), key)
+
+    def reset(self, stages=None):
+        """
+        Drop the checkpoints of the given stages (all of them by default).
+        """
+        if stages is None:
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+            return
+        for stage in stages:
+            path = self.checkpoint(stage).path
+            if os.path.exists(path):
+                os.remove(path)
+
+    def places(self):
+        """
+        Get the unique places found by the discover stage.
+
+        :return: Dict of place_id -> place record, in discovery order.
+        """
+        places = {}
+        for record in self.checkpoint("discover").load().values():
+            for place in record["places"]:
+                places.setdefault(place["place_id"], place)
+        return places
+
+    def _pending(self, stage, requires=None):
+        """
+        Get the places still to be processed by a stage.
+
+        :param stage: The stage.
+        :param requires: Stage whose output is needed, places it has not completed yet are skipped.
+        """
+        done = self.checkpoint(stage).load()
+        available = self.checkpoint(requires).load() if requires else None
+
+        pending = []
+        for place_id, place in self.places().items():
+            if place_id in done:
+                continue
+            if available is not None and place_id not in available:
+                continue
+            pending.append((place, available[place_id] if available is not None else None))
+        return pending
+
+    def discover(self):
+        """
+        Find the places around every location, one checkpoint record per location.
+        """
+        checkpoint = self.checkpoint("discover")
+        done = checkpoint.load()
+
+        for location in self.cluj_restaurants.locations:
+            if location in done:
+                continue
+
+            places = [
+                {
+                    "place_id": place["place_id"],
+                    "name": place["name"],
+                    "address": place.get("vicinity", "N/A"),
+                    "rating": place.get("rating")
+                }
+                for place in self.cluj_restaurants.search_location(location)
+            ]
+            checkpoint.append({"location": location, "places": places})
+            print(f"Discovered {len(places)} places around {location}")
+
+    def details(self):
+        """
+        Fetch the reviews and coordinates of every place with one Place Details call.
+        """
+        checkpoint = self.checkpoint("details")
+        for place, _ in self._pending("details"):
+            restaurant = Restaurant(place["name"], place["address"], place["place_id"], place["rating"])
+            restaurant.fetch_details(self.cluj_restaurants.api_key)
+
+            reviews = [
+                {
+                    "author_name": review.get("author_name", ""),
+                    "rating": review.get("rating"),
+                    "text": review.get("text", ""),
+                    "time": review.get("time")
+                }
+                for review in restaurant.reviews
+            ]
+            checkpoint.append({"place_id": place["place_id"], "reviews": reviews,
+                               "coordinates": restaurant.coordinates})
+
+    def classify(self):
+        """
+        Tag the reviews of every place with their emotions.
+        """
+        from places_api.emotions import classify_emotion, tag_reviews
+
+        checkpoint = self.checkpoint("classify")
+        pending = self._pending("classify", requires="details")
+        if not pending:
+            return
+
+        # Identical or near identical reviews are classified once and stored once per place
+        deduplicator = ReviewDeduplicator()
+        for record in checkpoint.load().values():
+            deduplicator.seed(record["reviews"])
+
+        # With a worker pool the places are classified in batches, checkpointed one by one
+        batch_size = 64 if self.pool is not None else 1
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            classify = classify_emotion
+            if self.pool is not None:
+                texts = [review["text"] for _, details in batch for review in details["reviews"]]
+                classify = self.pool.classify_new(texts, deduplicator).__getitem__
+
+            for place, details in batch:
+                review_data = tag_reviews(place["name"], [review["text"] for review in details["reviews"]],
+                                          deduplicator=deduplicator, classify=classify,
+                                          fields=review_fields(details["reviews"]))
+                checkpoint.append({"place_id": place["place_id"], "reviews": review_data})
+
+        print(deduplicator.report())
+
+    def distance(self):
+        """
+        Compute the distance of every place from the city center.
+        """
+        lat2, lon2 = map(float, self.cluj_restaurants.city_center_coordinates.split(","))
+
+        checkpoint = self.checkpoint("distance")
+        for place, details in self._pending("distance", requires="details"):
+            lat1, lon1 = details["coordinates"]
+            distance = None if lat1 is None else haversine_distance(lat1, lon1, lat2, lon2)
+            checkpoint.append({"place_id": place["place_id"], "distance": distance})
+
+    def scrape(self):
+        """
+        Scrape the number of employees of every place.
+        """
+        from webscraping.scraper import scrape_restaurant_data
+
+        pending = self._pending("scrape")
+        if not pending:
+            return
+
+        checkpoint = self.checkpoint("scrape")
+        place_ids = {}
+        for place, _ in pending:
+            place_ids.setdefault(place["name"], []).append(place["place_id"])
+
+        def save(result):
+            # Failed scrapes are not checkpointed, the next run tries them again
+            if result["Employees"] == "Error":
+                return
+            for place_id in place_ids.get(result["Name"], []):
+                checkpoint.append({"place_id": place_id, "company": result.get("Company", ""),
+                                   "address": result.get("Address", ""), "employees": result["Employees"]})
+
+        scrape_restaurant_data(list(place_ids), on_result=save)
+
+    def export(self):
+        """
+        Write the restaurants and reviews CSVs, the reviews JSON, the employee CSV
+        and the restaurant repository (if any) from the checkpoints.
+
+        The Google reviews of the JSON are replaced, the reviews of other sources in it are kept.
+        """
+        details = self.checkpoint("details").load()
+        classified = self.checkpoint("classify").load()
+        distances = self.checkpoint("distance").load()
+        employees = self.checkpoint("scrape").load()
+
+        self.cluj_restaurants.restaurants = RestaurantTable()
+        review_data = []
+        employee_rows = []
+        for place_id, place in self.places().items():
+            restaurant = Restaurant(place["name"], place["address"], place_id, place["rating"])
+            restaurant.reviews = details.get(place_id, {}).get("reviews", [])
+            restaurant.distance_from_city_center = distances.get(place_id, {}).get("distance")
+            self.cluj_restaurants.restaurants[place_id] = restaurant
+
+            review_data.extend(classified.get(place_id, {}).get("reviews", []))
+            if place_id in employees:
+                scraped = employees[place_id]
+                employee_rows.append([place["name"], scraped.get("company", ""), scraped.get("address", ""),
+                                      scraped["employees"]])
+
+        self.cluj_restaurants.export_to_csv(self.csv_file, self.reviews_csv)
+
+        # Reviews of other sources, added to the same file by e.g. tag_collected_reviews, are kept
+        try:
+            with open(self.json_file, "r", encoding="utf-8") as file:
+                other_sources = [review for review in json.load(file) if review.get("source") is not None]
+        except (FileNotFoundError, json.JSONDecodeError):
+            other_sources = []
+
+        tmp_file = self.json_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as file:
+            json.dump(review_data + other_sources, file, ensure_ascii=False, indent=4)
+        os.replace(tmp_file, self.json_file)
+        update_rollups(review_data, self.rollups_file)
+
+        repository = self.cluj_restaurants.repository
+        if repository is not None:
+            repository.upsert_restaurants(self.cluj_restaurants.restaurants.values())
+            for place_id in self.cluj_restaurants.restaurants.keys():
+                repository.add_reviews(classified.get(place_id, {}).get("reviews", []), place_id)
+
+        if employee_rows:
+            employee_data = pd.DataFrame(employee_rows, columns=["Name", "Company", "Address", "Employees"])
+            employee_data.to_csv(self.employee_csv, index=False)
+            link_employees(pd.read_csv(self.csv_file), employee_data).to_csv(self.matches_csv, index=False)
+
+        print(f"Exported {len(self.cluj_restaurants.restaurants)} restaurants to {self.csv_file}")
+
+    def run(self, stages=None):
+        """
+        Run the given stages in order (all of them by default), resuming each one.
+
+        :param stages: Names of the stages to run.
+        """
+        for stage in stages or STAGES:
+            print(f"Running stage: {stage}")
+            getattr(self, stage)()
@@ -0,0 +1,394 @@
+import hashlib
+import json
+import sqlite3
+import threading
+
+import pandas as pd
+
+from places_api.export import RESTAURANTS_CSV
+from places_api.review_store import REVIEWS_LOG, ReviewStore, name_key
+
+DB_FILE = "./data/restaurants.db"
+REVIEWS_JSON = "./data/reviews_with_emotions_google.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS restaurants (
+    place_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    address TEXT,
+    rating REAL,
+    distance REAL,
+    dominant_emotion TEXT
+);
+CREATE INDEX IF NOT EXISTS restaurants_name_key ON restaurants (name_key);
+CREATE INDEX IF NOT EXISTS restaurants_rating ON restaurants (rating);
+CREATE INDEX IF NOT EXISTS restaurants_distance ON restaurants (distance);
+CREATE INDEX IF NOT EXISTS restaurants_dominant_emotion ON restaurants (dominant_emotion);
+
+-- Trigram index of the names, for searching the names containing a text
+CREATE VIRTUAL TABLE IF NOT EXISTS restaurant_names USING fts5(
+    name_key, content='restaurants', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS restaurant_names_insert AFTER INSERT ON restaurants BEGIN
+    INSERT INTO restaurant_names (rowid, name_key) VALUES (new.rowid, new.name_key);
+END;
+CREATE TRIGGER IF NOT EXISTS restaurant_names_delete AFTER DELETE ON restaurants BEGIN
+    INSERT INTO restaurant_names (restaurant_names, rowid, name_key) VALUES ('delete', old.rowid, old.name_key);
+END;
+CREATE TRIGGER IF NOT EXISTS restaurant_names_update AFTER UPDATE OF name_key ON restaurants BEGIN
+    INSERT INTO restaurant_names (restaurant_names, rowid, name_key) VALUES ('delete', old.rowid, old.name_key);
+    INSERT INTO restaurant_names (rowid, name_key) VALUES (new.rowid, new.name_key);
+END;
+
+CREATE TABLE IF NOT EXISTS reviews (
+    review_key TEXT PRIMARY KEY,
+    place_id TEXT,
+    restaurant_name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    emotion TEXT,
+    confidence REAL,
+    time INTEGER,
+    rating REAL,
+    source TEXT,
+    log_offset INTEGER NOT NULL,
+    log_length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reviews_place_id ON reviews (place_id);
+CREATE INDEX IF NOT EXISTS reviews_name_key ON reviews (name_key);
+"""
+
+# Most frequent emotion of the reviews of every restaurant, ties broken alphabetically
+DOMINANT_EMOTION_SQL = """
+UPDATE restaurants SET dominant_emotion = (
+    SELECT emotion FROM reviews WHERE reviews.place_id = restaurants.place_id
+    GROUP BY emotion ORDER BY COUNT(*) DESC, emotion LIMIT 1
+)
+WHERE place_id = ?
+"""
+
+# Shortest text the trigram index can search, shorter ones are looked for in every name
+MIN_SEARCH_LENGTH = 3
+
+RESTAURANT_FIELDS = ["place_id", "name", "address", "rating", "distance", "dominant_emotion"]
+
+
+def _review_key(review):
+    text = f"{review['restaurant_name']}\0{review.get('time')}\0{review['review_text']}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class RestaurantRepository:
+    """
+    The restaurants and their reviews in an indexed SQLite database.
+
+    The dashboard queries it instead of loading the whole CSV and JSON files,
+    so a search only reads the matching rows. The review texts are kept only in
+    a ReviewStore, every review row holds the byte span of its text there.
+    """
+
+    def __init__(self, path=DB_FILE, reviews_log=REVIEWS_LOG):
+        """
+        :param path: The SQLite database file, created if missing.
+        :param reviews_log: The JSON Lines file of the ReviewStore.
+        """
+        self.path = path
+        self.reviews = ReviewStore(reviews_log)
+        # Shared by the sessions of the dashboard, the lock serializes the writes
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+
+        self.connection.executescript(SCHEMA)
+        if not self.reviews.exists():
+            # The texts are gone with the log, the reviews are imported again
+            with self.connection:
+                self.connection.execute("DELETE FROM reviews")
+
+    def close(self):
+        self.connection.close()
+
+    def is_empty(self):
+        return self.connection.execute("SELECT 1 FROM restaurants LIMIT 1").fetchone() is None
+
+    def clear(self):
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM reviews")
+            self.connection.execute("DELETE FROM restaurants")
+            self.reviews.clear()
+
+    def upsert_restaurants(self, restaurants):
+        """
+        Add restaurants or update the ones already stored.
+
+        :param restaurants: Restaurant objects or RestaurantRows.
+        """
+        rows = [
+            (restaurant.place_id, restaurant.name, name_key(restaurant.name), restaurant.address,
+             restaurant.rating, restaurant.distance_from_city_center)
+            for restaurant in restaurants
+        ]
+        with self._lock, self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO restaurants (place_id, name, name_key, address, rating, distance)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (place_id) DO UPDATE SET
+                    name = excluded.name, name_key = excluded.name_key, address = excluded.address,
+                    rating = excluded.rating, distance = excluded.distance
+                """,
+                rows
+            )
+            # Reviews stored before their restaurant are attached to it now
+            self.connection.executemany(
+                "UPDATE reviews SET place_id = ? WHERE place_id IS NULL AND name_key = ?",
+                [(row[0], row[2]) for row in rows]
+            )
+            self.connection.executemany(DOMINANT_EMOTION_SQL, [(row[0],) for row in rows])
+
+    def add_reviews(self, review_data, place_id=None):
+        """
+        Add reviews with emotions, reviews already stored are skipped.
+
+        :param review_data: Review entries as written to the reviews JSON.
+        :param place_id: Place ID of the restaurant of the reviews, looked up by name if not given.
+        """
+        if not review_data:
+            return
+
+        with self._lock, self.connection:
+            place_ids = {}
+            if place_id is None:
+                keys = {name_key(review["restaurant_name"]) for review in review_data}
+                for key in keys:
+                    row = self.connection.execute(
+                        "SELECT place_id FROM restaurants WHERE name_key = ? ORDER BY rowid LIMIT 1", (key,)
+                    ).fetchone()
+                    place_ids[key] = row["place_id"] if row else None
+
+            # Only the reviews not stored yet go to the log
+            new_reviews = {}
+            for review in review_data:
+                new_reviews.setdefault(_review_key(review), review)
+            stored = set()
+            keys = list(new_reviews)
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                stored.update(row["review_key"] for row in self.connection.execute(
+                    f"SELECT review_key FROM reviews WHERE review_key IN ({', '.join('?' * len(batch))})", batch
+                ))
+            new_reviews = {key: review for key, review in new_reviews.items() if key not in stored}
+
+            spans = self.reviews.append(list(new_reviews.values()))
+            rows = []
+            for (key, review), (offset, length) in zip(new_reviews.items(), spans):
+                restaurant_key = name_key(review["restaurant_name"])
+                rows.append((key, place_id or place_ids[restaurant_key], review["restaurant_name"], restaurant_key,
+                             review["emotion"], review.get("confidence"), review.get("time"), review.get("rating"),
+                             review.get("source"), offset, length))
+            self.connection.executemany(
+                """
+                INSERT INTO reviews (review_key, place_id, restaurant_name, name_key, emotion, confidence,
+                                     time, rating, source, log_offset, log_length)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+
+            touched = {row[1] for row in rows if row[1] is not None}
+            self.connection.executemany(DOMINANT_EMOTION_SQL, [(place,) for place in touched])
+
+    def update_emotions(self, review_data):
+        """
+        Store the emotions of reviews classified again, e.g. after a model change.
+
+        :param review_data: Review entries as written to the reviews JSON, the ones not stored are ignored.
+        """
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "UPDATE reviews SET emotion = ?, confidence = ? WHERE review_key = ?",
+                [(review["emotion"], review.get("confidence"), _review_key(review)) for review in review_data]
+            )
+            places = self.connection.execute("SELECT place_id FROM restaurants").fetchall()
+            self.connection.executemany(DOMINANT_EMOTION_SQL, [(row["place_id"],) for row in places])
+
+    def import_files(self, csv_file=RESTAURANTS_CSV, json_file=REVIEWS_JSON):
+        """
+        Fill the database from the restaurants CSV and the reviews JSON.
+
+        :param csv_file: Restaurants CSV with Name, Address, Rating, Place ID and Distance from Center.
+        :param json_file: Reviews JSON with the emotions.
+        """
+        df = pd.read_csv(csv_file)
+        df = df.astype(object).where(df.notna(), None)
+        self.upsert_restaurants(
+            _CsvRestaurant(row['Place ID'], row['Name'], row.get('Address'), row.get('Rating'),
+                           row.get('Distance from Center'))
+            for _, row in df.iterrows()
+        )
+
+        try:
+            with open(json_file, "r", encoding="utf-8") as file:
+                review_data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            review_data = []
+        self.add_reviews(review_data)
+
+    def _restaurants(self, where="", params=(), limit=None):
+        sql = f"SELECT {', '.join(RESTAURANT_FIELDS)} FROM restaurants {where} ORDER BY rowid"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    def get(self, place_id):
+        rows = self._restaurants("WHERE place_id = ?", (place_id,))
+        return rows[0] if rows else None
+
+    def search(self, query, limit=None):
+        """
+        Get the restaurants whose name contains a query, in the order they were added.
+
+        Texts shorter than MIN_SEARCH_LENGTH cannot use the name index and scan the names.
+
+        :param query: Text the names have to contain, compared case-insensitively.
+        :param limit: Maximum number of restaurants returned (optional).
+        """
+        condition, params = self._name_condition(query)
+        return self._restaurants(f"WHERE {condition}", params, limit)
+
+    @staticmethod
+    def _name_condition(query):
+        """
+        Build the condition on the restaurants whose name contains a query, served by the
+        name index for texts of at least MIN_SEARCH_LENGTH characters.
+
+        :return: Tuple of (SQL condition, parameters).
+        """
+        query = name_key(query)
+        if len(query) >= MIN_SEARCH_LENGTH:
+            # Quoted, so the query is searched as a plain string and not as FTS syntax
+            phrase = '"' + query.replace('"', '""') + '"'
+            return "rowid IN (SELECT rowid FROM restaurant_names WHERE restaurant_names MATCH ?)", (phrase,)
+        # Too short for trigrams, these still match anywhere in the name like the trend chart does
+        return "instr(name_key, ?) > 0", (query,)
+
+    def find_by_name(self, query):
+        """
+        Get the first restaurant whose name contains a query.
+
+        :return: Dict with the fields of RESTAURANT_FIELDS, None if no restaurant matches.
+        """
+        rows = self.search(query, limit=1)
+        return rows[0] if rows else None
+
+    def filter(self, min_rating=None, max_rating=None, max_distance=None, emotion=None, limit=None):
+        """
+        Get the restaurants in a rating range, near the center and with a dominant emotion.
+
+        Every condition is optional and served by its own index.
+
+        :param min_rating: Lowest rating.
+        :param max_rating: Highest rating.
+        :param max_distance: Farthest distance from the city center, in km.
+        :param emotion: Dominant emotion of the reviews.
+        :param limit: Maximum number of restaurants returned.
+        """
+        conditions, params = [], []
+        if min_rating is not None:
+            conditions.append("rating >= ?")
+            params.append(min_rating)
+        if max_rating is not None:
+            conditions.append("rating <= ?")
+            params.append(max_rating)
+        if max_distance is not None:
+            conditions.append("distance <= ?")
+            params.append(max_distance)
+        if emotion is not None:
+            conditions.append("dominant_emotion = ?")
+            params.append(emotion)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._restaurants(where, params, limit)
+
+    def _read_reviews(self, where, params):
+        rows = self.connection.execute(
+            f"SELECT place_id, emotion, confidence, log_offset, log_length FROM reviews WHERE {where} "
+            f"ORDER BY log_offset", params
+        ).fetchall()
+        reviews = self.reviews.read((row["log_offset"], row["log_length"]) for row in rows)
+        for review, row in zip(reviews, rows):
+            # The log is never rewritten, the emotions of reviews classified again are in the table
+            review.update(place_id=row["place_id"], emotion=row["emotion"], confidence=row["confidence"])
+        return reviews
+
+    def reviews_for_place(self, place_id):
+        """
+        Get the reviews of one restaurant, their texts read from the review log.
+
+        :return: List of review entries with their place_id.
+        """
+        return self._read_reviews("place_id = ?", (place_id,))
+
+    def _review_name_condition(self, query):
+        """
+        Build the condition on the reviews whose restaurant name contains a query.
+
+        :return: Tuple of (SQL condition, parameters).
+        """
+        condition, params = self._name_condition(query)
+        # Reviews of no Google place, e.g. from TripAdvisor, have no restaurant row to be found by
+        return (f"(name_key IN (SELECT name_key FROM restaurants WHERE {condition}) "
+                f"OR (place_id IS NULL AND instr(name_key, ?) > 0))", params + (name_key(query),))
+
+    def reviews_matching(self, query):
+        """
+        Get the reviews whose restaurant name contains a query, found like in search(),
+        their texts read from the review log.
+
+        :return: List of review entries with their place_id.
+        """
+        return self._read_reviews(*self._review_name_condition(query))
+
+    def emotion_counts(self, query):
+        """
+        Count the emotions of the reviews whose restaurant name contains a query, found like in search().
+
+        :return: List of (emotion, count), most frequent first.
+        """
+        condition, params = self._review_name_condition(query)
+        sql = f"SELECT emotion, COUNT(*) FROM reviews WHERE {condition} GROUP BY emotion ORDER BY COUNT(*) DESC, emotion"
+        return [tuple(row) for row in self.connection.execute(sql, params)]
+
+    def review_emotions(self):
+        """
+        Get the restaurant name and emotion of every review, for the clustering.
+
+        :return: DataFrame with the restaurant_name and emotion columns.
+        """
+        return pd.read_sql_query("SELECT restaurant_name, emotion FROM reviews", self.connection)
+
+    def restaurants_frame(self):
+        """
+        Get all the restaurants with the columns of the restaurants CSV.
+        """
+        return pd.read_sql_query(
+            'SELECT name AS "Name", address AS "Address", rating AS "Rating", place_id AS "Place ID", '
+            'distance AS "Distance from Center" FROM restaurants ORDER BY rowid',
+            self.connection
+        )
+
+
+class _CsvRestaurant:
+    """
+    A row of the restaurants CSV with the attributes upsert_restaurants() reads.
+    """
+
+    __slots__ = ("place_id", "name", "address", "rating", "distance_from_city_center")
+
+    def __init__(self, place_id, name, address, rating, distance_from_city_center):
+        self.place_id = place_id
+        self.name = name
+        self.address = address
+        self.rating = rating
+        self.distance_from_city_center = distance_from_city_center
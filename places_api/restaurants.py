@@ -1,17 +1,51 @@
-import requests
 import time
-import csv
 import math
 import json
-from transformers import pipeline
 
+from places_api.aggregates import rollups_path, update_rollups
+from places_api.dedup import ReviewDeduplicator
+from places_api.emotions import tag_reviews
+from places_api.export import RESTAURANTS_CSV, REVIEWS_CSV, CsvExportSink
+from places_api.http_client import get_client
+from places_api.linkage import MATCHES_CSV, link_employees
+from places_api.table import RestaurantTable
 from webscraping.scraper import scrape_restaurant_data
 
 import pandas as pd
 
-class Restaurant:
+MAX_REVIEWS = 50
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """
+    Calculate the distance between two points using the Haversine formula.
+
+    :return: Distance in kilometers, rounded to 2 decimal places.
+    """
+    R = 6371  # Earth radius in kilometers
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lon2 - lon1)
+
+    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return round(R * c, 2)
+
+
+def review_fields(reviews):
+    """
+    Get the fields of the Google reviews stored along with their emotions.
 
-    emotion_analyzer = pipeline('text-classification', model='j-hartmann/emotion-english-distilroberta-base')
+    :param reviews: Review dicts from the Google Places API.
+    :return: List of {"author_name", "time", "rating"} dicts.
+    """
+    return [{"author_name": review.get("author_name"), "time": review.get("time"), "rating": review.get("rating")}
+            for review in reviews]
+
+
+class Restaurant:
 
     def __init__(self, name, address, place_id, rating=None):
         """
@@ -27,52 +61,54 @@ class Restaurant:
         self.place_id = place_id
         self.rating = rating
         self.reviews = []
+        self.coordinates = None
         self.distance_from_city_center = None
 
-    def fetch_reviews(self, api_key, json_file):
+    def fetch_details(self, api_key):
+        """
+        Fetch the reviews and the coordinates of this restaurant with a single Place Details call.
+
+        :param api_key: Google Places API key.
+        :return: The 'result' part of the Place Details response.
+        """
+        data = get_client(api_key).place_details(self.place_id)
+
+        result = data.get("result", {})
+        self.reviews = result.get("reviews", [])[:MAX_REVIEWS]
+
+        location = result.get("geometry", {}).get("location", {})
+        self.coordinates = (location.get("lat"), location.get("lng"))
+
+        return result
+
+    def fetch_reviews(self, api_key, json_file, deduplicator=None, repository=None):
         """
         Fetch reviews for this restaurant from the Google Places API.
 
         :param api_key: Google Places API key.
+        :param json_file: Path to the JSON file the reviews with emotions are added to.
+        :param deduplicator: ReviewDeduplicator skipping the duplicate reviews (optional).
+        :param repository: RestaurantRepository the reviews are also added to (optional).
         """
-        url = f"https://maps.googleapis.com/maps/api/place/details/json?placeid={self.place_id}&key={api_key}"
-        response = requests.get(url)
-        data = response.json()
-        
-        reviews = data.get("result", {}).get("reviews", [])
-        self.reviews = reviews[:50]  # Limit to 50 reviews
+        self.fetch_details(api_key)
 
         # Analyze emotions and save to JSON
-        review_data = []
-        for review in self.reviews:
-            text = review.get("text", "")
-            if text:
-                emotion_results = self.emotion_analyzer(text[:512])
-                if emotion_results:
-                    emotion = emotion_results[0]['label']
-                    confidence = emotion_results[0]['score']
-                else:
-                    emotion = "Unknown"
-                    confidence = 0.0
-
-                review_entry = {
-                    "restaurant_name": self.name,
-                    "review_text": text,
-                    "emotion": emotion,
-                    "confidence": confidence
-                }
-                review_data.append(review_entry)
+        review_data = tag_reviews(self.name, [review.get("text", "") for review in self.reviews],
+                                  deduplicator=deduplicator, fields=review_fields(self.reviews))
 
         # Write to JSON file
         self._write_to_json(json_file, review_data)
+        if repository is not None:
+            repository.add_reviews(review_data, self.place_id)
 
     @staticmethod
-    def _write_to_json(json_file, review_data):
+    def _write_to_json(json_file, review_data, rollups_file=None):
         """
         Write review data to a JSON file.
 
         :param json_file: Path to the JSON file.
         :param review_data: List of reviews with emotions.
+        :param rollups_file: The monthly emotion rollups the reviews are added to (default: next to json_file).
         """
         try:
             with open(json_file, "r", encoding="utf-8") as file:
@@ -85,6 +121,9 @@ class Restaurant:
         with open(json_file, "w", encoding="utf-8") as file:
             json.dump(existing_data, file, ensure_ascii=False, indent=4)
 
+        # Keep the monthly emotion counts up to date with the new reviews only
+        update_rollups(review_data, rollups_file or rollups_path(json_file))
+
     def calculate_distance_from_city_center(self, city_center_coordinates, api_key):
         """
         Calculate the distance from the restaurant to the city center using the Haversine formula.
@@ -93,41 +132,27 @@ class Restaurant:
         """
         # Restaurant's coordinates (latitude, longitude)
         lat1, lon1 = self.get_coordinates(api_key)
+        if lat1 is None:
+            # The place was not found, its distance stays unknown like in the pipeline
+            self.distance_from_city_center = None
+            return
         
         # City center coordinates (latitude, longitude)
         lat2, lon2 = map(float, city_center_coordinates.split(","))
         
-        # Haversine formula
-        R = 6371  # Earth radius in kilometers
-        phi1 = math.radians(lat1)
-        phi2 = math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lon2 - lon1)
-        
-        a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        
-        # Distance in kilometers
-        distance = R * c
-        self.distance_from_city_center = round(distance, 2)  # Round to 2 decimal places
-
+        self.distance_from_city_center = haversine_distance(lat1, lon1, lat2, lon2)
 
     def get_coordinates(self, api_key):
         """
         Fetch the restaurant's coordinates from the Google Places API.
+        The coordinates already fetched along with the reviews are reused.
         
         :return: Tuple of (latitude, longitude)
         """
-        url = f"https://maps.googleapis.com/maps/api/place/details/json?placeid={self.place_id}&key={api_key}"
-        response = requests.get(url)
-        data = response.json()
+        if self.coordinates is None:
+            self.fetch_details(api_key)
         
-        result = data.get("result", {})
-        location = result.get("geometry", {}).get("location", {})
-        lat = location.get("lat")
-        lng = location.get("lng")
-        
-        return lat, lng
+        return self.coordinates
 
     def __str__(self):
         """
@@ -137,7 +162,7 @@ class Restaurant:
 
 class ClujRestaurants:
 
-    def __init__(self, api_key, locations, radius=5000, place_type="restaurant"):
+    def __init__(self, api_key, locations, radius=5000, place_type="restaurant", call_budget=None, repository=None):
         """
         Initialize the ClujRestaurants class.
 
@@ -145,57 +170,125 @@ class ClujRestaurants:
         :param locations: List of location coordinates (latitude, longitude) as strings.
         :param radius: Radius in meters for the search.
         :param place_type: Type of place to search (default is 'restaurant').
+        :param call_budget: Maximum number of Places API calls, in total or as a dict per endpoint (optional).
+        :param repository: RestaurantRepository every fetched restaurant and review is written to (optional).
         """
         self.api_key = api_key
+        self.client = get_client(api_key)  # Shared with every Restaurant using the same key
+        if call_budget is not None:
+            self.client.budget = call_budget
         self.locations = locations
         self.radius = radius
         self.place_type = place_type
-        self.restaurants = {}
+        self.restaurants = RestaurantTable()  # place_id -> restaurant, stored column by column
         self.city_center_coordinates = "46.770439,23.591423"
+        self.deduplicator = ReviewDeduplicator()
+        self.repository = repository
+
+    def reset(self):
+        """
+        Forget the fetched restaurants and reviews, so the next fetch gets every place again.
+        """
+        self.restaurants = RestaurantTable()
+        self.deduplicator = ReviewDeduplicator()
 
-    def fetch_restaurants(self, json_file="./data/reviews_with_emotions_google.json"):
+    def fetch_restaurants(self, json_file="./data/reviews_with_emotions_google.json", pool=None, batch_size=32, sink=None):
         """
         Fetch unique restaurants from the Google Places API for all locations.
+
+        :param json_file: Path to the JSON file the reviews with emotions are added to.
+        :param pool: EmotionWorkerPool classifying the reviews of batch_size restaurants at once (optional).
+        :param batch_size: Number of restaurants whose reviews are sent to the pool together.
+        :param sink: CsvExportSink every restaurant is written to as soon as it is fetched (optional).
+                     The restaurants stored by earlier fetches are written to it first, so it
+                     always ends up with all of them.
         """
+        # Overlapping search circles and refreshes bring the same reviews again
+        self.deduplicator.seed_from_json(json_file)
+        self._untagged = []
+
+        # Places already stored are not fetched again, the sink still needs their rows
+        if sink is not None:
+            for restaurant in self.restaurants.values():
+                sink.write(restaurant)
+
         for loc in self.locations:
-            self._fetch_from_location(loc, json_file)
+            self._fetch_from_location(loc, json_file, pool, batch_size, sink)
+
+        if pool is not None:
+            self._tag_with_pool(json_file, pool)
+
+        print(self.deduplicator.report())
+        print(self.client.report())
+
+    def _tag_with_pool(self, json_file, pool):
+        """
+        Tag the reviews of the restaurants waiting in self._untagged on the worker pool.
+        """
+        texts = [review.get("text", "") for restaurant in self._untagged for review in restaurant.reviews]
+        emotions = pool.classify_new(texts, self.deduplicator)
+
+        review_data = []
+        for restaurant in self._untagged:
+            restaurant_reviews = tag_reviews(restaurant.name, [review.get("text", "") for review in restaurant.reviews],
+                                             deduplicator=self.deduplicator, classify=emotions.__getitem__,
+                                             fields=review_fields(restaurant.reviews))
+            if self.repository is not None:
+                self.repository.add_reviews(restaurant_reviews, restaurant.place_id)
+            review_data.extend(restaurant_reviews)
+        Restaurant._write_to_json(json_file, review_data)
+        self._untagged = []
+
+    def search_location(self, location):
+        """
+        Run a Nearby Search around a location, following the result pages.
+
+        :param location: Location coordinates (latitude, longitude) as a string.
+        :return: Generator of the place dicts returned by the API.
+        """
+        data = self.client.nearby_search(location, self.radius, self.place_type)
+        while True:
+            yield from data.get('results', [])
 
-    def _fetch_from_location(self, location, json_file):
-        url = f"https://maps.googleapis.com/maps/api/place/nearbysearch/json?location={location}&radius={self.radius}&type={self.place_type}&key={self.api_key}"
-        while url:
-            response = requests.get(url)
-            data = response.json()
-            
-            for place in data.get('results', []):
-                if place['place_id'] not in self.restaurants:
-                    restaurant = Restaurant(
-                        name=place['name'],
-                        address=place.get('vicinity', 'N/A'),
-                        place_id=place['place_id'],
-                        rating=place.get('rating')
-                    )
-                    restaurant.fetch_reviews(self.api_key, json_file)
-                    restaurant.calculate_distance_from_city_center(self.city_center_coordinates, self.api_key)
-                    self.restaurants[place['place_id']] = restaurant
-            
             next_page_token = data.get('next_page_token')
-            if next_page_token:
-                time.sleep(2)
-                url = f"https://maps.googleapis.com/maps/api/place/nearbysearch/json?pagetoken={next_page_token}&key={self.api_key}"
-            else:
+            if not next_page_token:
                 break
 
+            # The token only becomes valid after a short delay, the client retries if it is still too early
+            time.sleep(2)
+            data = self.client.next_page(next_page_token)
+
+    def _fetch_from_location(self, location, json_file, pool=None, batch_size=32, sink=None):
+        for place in self.search_location(location):
+            if place['place_id'] not in self.restaurants:
+                restaurant = Restaurant(
+                    name=place['name'],
+                    address=place.get('vicinity', 'N/A'),
+                    place_id=place['place_id'],
+                    rating=place.get('rating')
+                )
+                if pool is None:
+                    restaurant.fetch_reviews(self.api_key, json_file, self.deduplicator, self.repository)
+                else:
+                    restaurant.fetch_details(self.api_key)
+                    self._untagged.append(restaurant)
+                    if len(self._untagged) >= batch_size:
+                        self._tag_with_pool(json_file, pool)
+                restaurant.calculate_distance_from_city_center(self.city_center_coordinates, self.api_key)
+                self.restaurants[place['place_id']] = restaurant
+                if sink is not None:
+                    sink.write(restaurant)
+                if self.repository is not None:
+                    self.repository.upsert_restaurants([restaurant])
+
     def get_restaurant_by_name(self, name):
         """
         Get the details of a restaurant by name.
 
         :param name: The name of the restaurant to search for.
-        :return: A Restaurant object with the restaurant's details (None if not found).
+        :return: A RestaurantRow with the restaurant's details (None if not found).
         """
-        for restaurant in self.restaurants.values():
-            if restaurant.name.lower() == name.lower():
-                return restaurant
-        return None
+        return self.restaurants.find_by_name(name)
 
     def get_restaurants(self):
         """
@@ -236,30 +329,28 @@ class ClujRestaurants:
                 print("  No reviews available.")
             print("\n---")
 
-    def export_to_csv(self, filename="./data/google_restaurants.csv"):
+    def export_to_csv(self, filename=RESTAURANTS_CSV, reviews_filename=REVIEWS_CSV):
         """
-        Export the fetched restaurant data to a CSV file.
+        Export the fetched restaurant data to a CSV file, and their reviews to a separate one.
 
         :param filename: The name of the CSV file to save the data.
+        :param reviews_filename: The name of the CSV file to save the reviews.
         """
-        with open(filename, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            # Write the header
-            writer.writerow(["Name", "Address", "Rating", "Place ID", "Reviews", "Distance from Center"])
-            
-            # Write restaurant details
+        with CsvExportSink(filename, reviews_filename) as sink:
             for restaurant in self.restaurants.values():
-                reviews_text = "; ".join(
-                    [f"{review['author_name']}: {review['text'][:1000]}" for review in restaurant.reviews]
-                )
-                writer.writerow([restaurant.name, restaurant.address, restaurant.rating, restaurant.place_id, reviews_text, restaurant.distance_from_city_center])
+                sink.write(restaurant)
 
-    def scrape_employee_data(self, restaurant_csv="./data/googe_restaurants.csv", employee_csv="./data/employee_data.csv", merged_csv='./data/merged_data.csv'):
+    def scrape_employee_data(self, restaurant_csv="./data/google_restaurants.csv", employee_csv="./data/employee_data.csv", merged_csv='./data/merged_data.csv', matches_csv=MATCHES_CSV):
         """
-        Use the scraper to fetch employee data for the restaurants and append it to the existing restaurant CSV file.
+        Use the scraper to fetch employee data for the restaurants and join it with the existing restaurant CSV file.
+
+        The scraped records are linked to the restaurants by normalized name and address,
+        the links and their scores are saved to the match table.
 
         :param restaurant_csv: The existing CSV file with restaurant details.
         :param employee_csv: The temporary CSV file to save scraped employee data.
+        :param merged_csv: The CSV file with the restaurants and their number of employees.
+        :param matches_csv: The match table between restaurants and employee data.
         """
         # Extract the names of the restaurants
         restaurant_names = [restaurant.name for restaurant in self.restaurants.values()]
@@ -272,11 +363,13 @@ class ClujRestaurants:
             restaurant_data = pd.read_csv(restaurant_csv)
             employee_data = pd.read_csv(employee_csv)
 
-            # Merge the two datasets on the restaurant name
-            merged_data = pd.merge(restaurant_data, employee_data, on="Name", how="left")
+            # Link the two datasets on the normalized names and addresses
+            matches = link_employees(restaurant_data, employee_data)
+            matches.to_csv(matches_csv, index=False)
+            print(f"Matched {len(matches)}/{len(restaurant_data)} restaurants, match table saved to {matches_csv}")
 
-            # Save the updated data back to the original CSV
+            merged_data = pd.merge(restaurant_data, matches[["Place ID", "Employees"]], on="Place ID", how="left")
             merged_data.to_csv(merged_csv, index=False)
-            print(f"Updated restaurant data saved to {restaurant_csv}")
+            print(f"Updated restaurant data saved to {merged_csv}")
         except Exception as e:
             print(f"Error processing CSV files: {e}")
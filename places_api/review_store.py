@@ -0,0 +1,87 @@
+import json
+import os
+
+REVIEWS_LOG = "./data/reviews.jsonl"
+
+
+def name_key(name):
+    """
+    Normalize a restaurant name for searching, the way the dashboard compares names.
+
+    :param name: The restaurant name.
+    :return: The stripped, lowercase name.
+    """
+    return str(name).strip().lower()
+
+
+class ReviewStore:
+    """
+    Review texts in an append-only JSON Lines file.
+
+    Appending returns the byte span of every review, whoever keeps those spans can read
+    a review back by seeking to it, without parsing the rest of the file however large it grows.
+    """
+
+    def __init__(self, path=REVIEWS_LOG):
+        """
+        :param path: The JSON Lines file.
+        """
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, records):
+        """
+        Append reviews with a single write.
+
+        :param records: Review entries to store.
+        :return: List of (offset, length) of the records, in their order.
+        """
+        lines = [(json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8") for record in records]
+        if not lines:
+            return []
+        data = b"".join(lines)
+
+        # O_APPEND puts the write at the end even when another process appends too
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if os.write(fd, data) != len(data):
+                raise OSError(f"Short write to {self.path}")
+            offset = os.lseek(fd, 0, os.SEEK_CUR) - len(data)
+        finally:
+            os.close(fd)
+
+        spans = []
+        for line in lines:
+            spans.append((offset, len(line)))
+            offset += len(line)
+        return spans
+
+    def read(self, spans):
+        """
+        Read the reviews stored at some byte spans.
+
+        :param spans: Iterable of (offset, length) returned by append().
+        :return: List of review entries, in the order of their offsets.
+        """
+        # Neighbouring spans, like the reviews of one restaurant, are read at once
+        merged = []
+        for offset, length in sorted(spans):
+            if merged and merged[-1][0] + merged[-1][1] == offset:
+                merged[-1][1] += length
+            else:
+                merged.append([offset, length])
+        if not merged:
+            return []
+
+        reviews = []
+        with open(self.path, "rb") as file:
+            for offset, length in merged:
+                file.seek(offset)
+                reviews.extend(json.loads(line) for line in file.read(length).splitlines())
+        return reviews
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,277 @@
+import sys
+
+import numpy as np
+
+# Review fields kept from the Google Places API response
+REVIEW_FIELDS = ("author_name", "text", "time", "rating")
+
+
+def _grow(array, capacity, fill):
+    grown = np.full(capacity, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class ReviewTable:
+    """
+    The reviews of all the restaurants, stored column by column.
+
+    Author names and texts are interned, so a text cross-posted to several places
+    or fetched again on a refresh is held in memory only once.
+    """
+
+    def __init__(self, capacity=1024):
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.ratings = np.full(capacity, np.nan, dtype=np.float32)
+        self.authors = []
+        self.texts = []
+
+    def __len__(self):
+        return len(self.texts)
+
+    def extend(self, reviews):
+        """
+        Append the reviews of one restaurant.
+
+        :param reviews: List of review dicts from the Google Places API.
+        :return: Tuple of (start, count) locating the reviews in the table.
+        """
+        start = len(self.texts)
+        end = start + len(reviews)
+        if end > len(self.times):
+            capacity = max(end, 2 * len(self.times))
+            self.times = _grow(self.times, capacity, 0)
+            self.ratings = _grow(self.ratings, capacity, np.nan)
+        self.authors.extend([""] * len(reviews))
+        self.texts.extend([""] * len(reviews))
+
+        return self.overwrite(start, reviews)
+
+    def overwrite(self, start, reviews):
+        """
+        Write reviews over the ones stored from a position, e.g. the former reviews of the same restaurant.
+
+        :param start: Position of the first review written.
+        :param reviews: List of review dicts from the Google Places API, they have to fit in the table.
+        :return: Tuple of (start, count) locating the reviews in the table.
+        """
+        for i, review in enumerate(reviews, start):
+            self.authors[i] = _intern(review.get("author_name", ""))
+            self.texts[i] = _intern(review.get("text", ""))
+            self.times[i] = review.get("time") or 0
+            rating = review.get("rating")
+            self.ratings[i] = np.nan if rating is None else rating
+
+        return start, len(reviews)
+
+    def slice(self, start, count):
+        """
+        Get reviews as dicts with the fields of REVIEW_FIELDS.
+
+        :param start: Position of the first review.
+        :param count: Number of reviews.
+        """
+        return [
+            {
+                "author_name": self.authors[i],
+                "text": self.texts[i],
+                "time": int(self.times[i]) or None,
+                "rating": None if np.isnan(self.ratings[i]) else float(self.ratings[i])
+            }
+            for i in range(start, start + count)
+        ]
+
+
+class RestaurantRow:
+    """
+    Lightweight view of one row of a RestaurantTable with the attributes of a Restaurant.
+    """
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    @property
+    def place_id(self):
+        return self._table.place_ids[self._row]
+
+    @property
+    def name(self):
+        return self._table.names[self._row]
+
+    @property
+    def address(self):
+        return self._table.addresses[self._row]
+
+    @property
+    def rating(self):
+        return self._table._optional(self._table.ratings, self._row)
+
+    @property
+    def coordinates(self):
+        lat, lng = self._table.lats[self._row], self._table.lngs[self._row]
+        return None if np.isnan(lat) else (float(lat), float(lng))
+
+    @property
+    def distance_from_city_center(self):
+        return self._table._optional(self._table.distances, self._row)
+
+    @distance_from_city_center.setter
+    def distance_from_city_center(self, distance):
+        self._table.distances[self._row] = np.nan if distance is None else distance
+
+    @property
+    def reviews(self):
+        return self._table.review_table.slice(self._table.review_starts[self._row],
+                                              self._table.review_counts[self._row])
+
+    @reviews.setter
+    def reviews(self, reviews):
+        self._table._set_reviews(self._row, reviews)
+
+    def __str__(self):
+        """
+        Return a string representation of the restaurant's basic details.
+        """
+        return f"Name: {self.name}, Address: {self.address}, Rating: {self.rating if self.rating else 'N/A'}"
+
+
+class RestaurantTable:
+    """
+    Columnar in-memory table of restaurants keyed by place_id.
+
+    Behaves like the former dict of place_id -> Restaurant: assigning a Restaurant
+    copies its fields into the columns, reading gives back a RestaurantRow view.
+    """
+
+    def __init__(self, capacity=256):
+        self.place_ids = []
+        self.names = []
+        self.addresses = []
+        self.ratings = np.full(capacity, np.nan)
+        self.distances = np.full(capacity, np.nan)
+        self.lats = np.full(capacity, np.nan)
+        self.lngs = np.full(capacity, np.nan)
+        self.review_starts = np.zeros(capacity, dtype=np.int64)
+        self.review_counts = np.zeros(capacity, dtype=np.int32)
+        self.review_table = ReviewTable()
+        self._unused_reviews = 0  # Positions of the review table no row points to anymore
+        self._rows = {}
+        self._rows_by_name = None
+
+    @staticmethod
+    def _optional(column, row):
+        value = column[row]
+        return None if np.isnan(value) else float(value)
+
+    def _ensure_capacity(self, size):
+        if size <= len(self.ratings):
+            return
+        capacity = max(size, 2 * len(self.ratings))
+        self.ratings = _grow(self.ratings, capacity, np.nan)
+        self.distances = _grow(self.distances, capacity, np.nan)
+        self.lats = _grow(self.lats, capacity, np.nan)
+        self.lngs = _grow(self.lngs, capacity, np.nan)
+        self.review_starts = _grow(self.review_starts, capacity, 0)
+        self.review_counts = _grow(self.review_counts, capacity, 0)
+
+    def _set_reviews(self, row, reviews):
+        start, count = self.review_starts[row], self.review_counts[row]
+        if len(reviews) <= count:
+            # A place added again reuses the positions of its former reviews
+            self.review_starts[row], self.review_counts[row] = self.review_table.overwrite(start, reviews)
+            self._unused_reviews += count - len(reviews)
+        else:
+            self.review_starts[row], self.review_counts[row] = self.review_table.extend(reviews)
+            self._unused_reviews += count
+
+        if self._unused_reviews > len(self.review_table) // 2:
+            self._compact_reviews()
+
+    def _compact_reviews(self):
+        """
+        Copy the reviews the rows point to into a new review table, leaving out the unused ones.
+        """
+        review_table = ReviewTable(max(1024, len(self.review_table) - self._unused_reviews))
+        for row in range(len(self.place_ids)):
+            reviews = self.review_table.slice(self.review_starts[row], self.review_counts[row])
+            self.review_starts[row], self.review_counts[row] = review_table.extend(reviews)
+        self.review_table = review_table
+        self._unused_reviews = 0
+
+    def add(self, restaurant):
+        """
+        Copy a Restaurant into the table, replacing the row with the same place_id.
+
+        :param restaurant: A Restaurant (or RestaurantRow) instance.
+        :return: The RestaurantRow of the restaurant.
+        """
+        row = self._rows.get(restaurant.place_id)
+        if row is None:
+            row = len(self.place_ids)
+            self._ensure_capacity(row + 1)
+            self.place_ids.append(restaurant.place_id)
+            self.names.append(_intern(restaurant.name))
+            self.addresses.append(_intern(restaurant.address))
+            self._rows[restaurant.place_id] = row
+        else:
+            self.names[row] = _intern(restaurant.name)
+            self.addresses[row] = _intern(restaurant.address)
+        self._rows_by_name = None
+
+        self.ratings[row] = np.nan if restaurant.rating is None else restaurant.rating
+        distance = restaurant.distance_from_city_center
+        self.distances[row] = np.nan if distance is None else distance
+        coordinates = getattr(restaurant, "coordinates", None)
+        if coordinates is not None and coordinates[0] is not None:
+            self.lats[row], self.lngs[row] = coordinates
+        self._set_reviews(row, restaurant.reviews)
+
+        return RestaurantRow(self, row)
+
+    def find_by_name(self, name):
+        """
+        Get the first restaurant with the given name, case insensitive.
+
+        :param name: The name of the restaurant.
+        :return: A RestaurantRow (None if not found).
+        """
+        if self._rows_by_name is None:
+            self._rows_by_name = {}
+            for row, row_name in enumerate(self.names):
+                self._rows_by_name.setdefault(row_name.lower(), row)
+
+        row = self._rows_by_name.get(name.lower())
+        return None if row is None else RestaurantRow(self, row)
+
+    def __len__(self):
+        return len(self.place_ids)
+
+    def __contains__(self, place_id):
+        return place_id in self._rows
+
+    def __getitem__(self, place_id):
+        return RestaurantRow(self, self._rows[place_id])
+
+    def __setitem__(self, place_id, restaurant):
+        if place_id != restaurant.place_id:
+            raise KeyError(f"place_id mismatch: {place_id} != {restaurant.place_id}")
+        self.add(restaurant)
+
+    def __iter__(self):
+        return iter(self.place_ids)
+
+    def keys(self):
+        return list(self.place_ids)
+
+    def values(self):
+        return [RestaurantRow(self, row) for row in range(len(self.place_ids))]
+
+    def items(self):
+        return [(place_id, RestaurantRow(self, row)) for row, place_id in enumerate(self.place_ids)]
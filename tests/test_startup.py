@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from tools.profile_startup import HEAVY_MODULES, STARTUP_BUDGET, profile_import
+
+# Slack over the budget, for slower or busier machines than the one it was set on
+BUDGET_SLACK = 2
+
+
+@pytest.fixture(scope="module")
+def app_import(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("startup")
+
+    # The API key comes from an untracked credentials package, a stub stands in for it
+    package = tmp_path / "credentials"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "credentials_provider.py").write_text("def get_gplaces_api_key():\n    return 'test-key'\n")
+
+    # The app keeps its data in ./data, an empty one leaves the repository's untouched
+    (tmp_path / "data").mkdir()
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path), REPO_DIR]))
+    return profile_import("app", env=env, cwd=tmp_path)
+
+
+def test_app_imports_no_heavy_modules(app_import):
+    _, _, loaded = app_import
+    assert [module for module in HEAVY_MODULES if module in loaded] == []
+
+
+def test_app_starts_within_budget(app_import):
+    wall_time, _, _ = app_import
+    assert wall_time <= STARTUP_BUDGET * BUDGET_SLACK, f"importing app took {wall_time:.3f}s"
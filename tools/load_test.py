@@ -0,0 +1,313 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import nullcontext
+from html.parser import HTMLParser
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Searches the simulated users type, a mix of hits and misses
+QUERIES = ["bulga", "mezza", "via", "pizza", "cafe", "bistro", "sushi", "no such place"]
+
+# How often each action is picked by a session
+ACTIONS = {"refresh": 1, "search": 3, "clusters": 2}
+
+MIN_CLUSTERS, MAX_CLUSTERS = 2, 7
+
+
+class _OutputFinder(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.outputs = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if attrs.get("id") and any(c.startswith("shiny-") and c.endswith("-output") for c in classes):
+            self.outputs.append(attrs["id"])
+
+
+def find_outputs(base_url):
+    """
+    Get the ids of the outputs of the dashboard from its page, like a browser would.
+
+    :param base_url: URL of the running app, e.g. http://127.0.0.1:8000.
+    :return: List of output ids.
+    """
+    with urllib.request.urlopen(base_url) as response:
+        finder = _OutputFinder()
+        finder.feed(response.read().decode("utf-8"))
+    return finder.outputs
+
+
+class ServerMonitor:
+    """
+    Sample the CPU and memory use of the server process in a background thread.
+
+    Uses psutil when it is installed, /proc otherwise.
+    """
+
+    def __init__(self, pid, interval=0.5):
+        """
+        :param pid: Process id of the server.
+        :param interval: Seconds between two samples.
+        """
+        self.pid = pid
+        self.interval = interval
+        self.samples = []  # (cpu percent, rss in bytes)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+        try:
+            import psutil
+            self._process = psutil.Process(pid)
+        except ImportError:
+            self._process = None
+
+    def _cpu_seconds(self):
+        if self._process is not None:
+            times = self._process.cpu_times()
+            return times.user + times.system
+        with open(f"/proc/{self.pid}/stat") as file:
+            # The command name may contain spaces, the fields start after its closing parenthesis
+            fields = file.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def _rss(self):
+        if self._process is not None:
+            return self._process.memory_info().rss
+        with open(f"/proc/{self.pid}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def _run(self):
+        last_cpu, last_time = self._cpu_seconds(), time.perf_counter()
+        while not self._stop.wait(self.interval):
+            try:
+                cpu, now = self._cpu_seconds(), time.perf_counter()
+                self.samples.append((100 * (cpu - last_cpu) / (now - last_time), self._rss()))
+            except (OSError, ProcessLookupError):
+                break
+            last_cpu, last_time = cpu, now
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        """
+        :return: Dict with the mean and peak CPU percent and the start and peak RSS in MB, None without samples.
+        """
+        if not self.samples:
+            return None
+        cpu = [sample[0] for sample in self.samples]
+        rss = [sample[1] / 2 ** 20 for sample in self.samples]
+        return {"cpu_mean": sum(cpu) / len(cpu), "cpu_peak": max(cpu), "rss_start": rss[0], "rss_peak": max(rss)}
+
+
+class Session:
+    """
+    One simulated browser session, talking the Shiny websocket protocol.
+    """
+
+    def __init__(self, base_url, outputs, rng, timeout=120):
+        """
+        :param base_url: URL of the running app.
+        :param outputs: Ids of the outputs the session shows.
+        :param rng: random.Random picking the actions.
+        :param timeout: Seconds an action may take before it counts as failed.
+        """
+        self.ws_url = base_url.replace("http", "ws", 1).rstrip("/") + "/websocket/"
+        self.outputs = outputs
+        self.rng = rng
+        self.timeout = timeout
+        self.counters = {"refresh_btn": 0, "search_btn": 0}
+        self.clusters = 3
+        self.results = []  # (action, latency in seconds or None on failure)
+        self._ws = None
+
+    def _initial_inputs(self):
+        inputs = {
+            ".clientdata_pixelratio": 1,
+            ".clientdata_url_protocol": "http:",
+            ".clientdata_url_pathname": "/",
+            ".clientdata_url_search": "",
+            ".clientdata_url_hash": "",
+            ".clientdata_allowDataUriScheme": True,
+            "refresh_btn:shiny.action": 0,
+            "search_btn:shiny.action": 0,
+            "search_query": QUERIES[0],
+            "num_clusters": self.clusters,
+        }
+        # Every output is reported visible, otherwise the server suspends it
+        for output in self.outputs:
+            inputs[f".clientdata_output_{output}_hidden"] = False
+            inputs[f".clientdata_output_{output}_width"] = 800
+            inputs[f".clientdata_output_{output}_height"] = 600
+        return inputs
+
+    async def _wait_for_outputs(self):
+        # Done once the outputs were sent and the server is no longer busy
+        busy, got_values = False, False
+        while busy or not got_values:
+            message = json.loads(await self._ws.recv())
+            if "busy" in message:
+                busy = message["busy"] == "busy"
+            if message.get("values"):
+                got_values = True
+            if message.get("errors"):
+                raise RuntimeError(f"output errors: {', '.join(message['errors'])}")
+
+    async def _timed(self, action, method, data):
+        start = time.perf_counter()
+        try:
+            await self._ws.send(json.dumps({"method": method, "data": data}))
+            await asyncio.wait_for(self._wait_for_outputs(), self.timeout)
+            self.results.append((action, time.perf_counter() - start))
+        except (asyncio.TimeoutError, RuntimeError) as e:
+            print(f"{action} failed: {e or 'timeout'}", file=sys.stderr)
+            self.results.append((action, None))
+
+    def _next_action(self):
+        action = self.rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        if action == "refresh":
+            self.counters["refresh_btn"] += 1
+            return action, {"refresh_btn:shiny.action": self.counters["refresh_btn"]}
+        if action == "search":
+            self.counters["search_btn"] += 1
+            return action, {"search_query": self.rng.choice(QUERIES),
+                            "search_btn:shiny.action": self.counters["search_btn"]}
+        # Moving the slider to the value it already has triggers nothing
+        self.clusters = self.rng.choice([n for n in range(MIN_CLUSTERS, MAX_CLUSTERS + 1) if n != self.clusters])
+        return action, {"num_clusters": self.clusters}
+
+    async def run(self, actions, think_time):
+        """
+        Open the session, then run a number of random actions.
+
+        :param actions: Number of actions after the initial page load.
+        :param think_time: Maximum pause between two actions, in seconds.
+        """
+        import websockets
+
+        async with websockets.connect(self.ws_url, max_size=None) as ws:
+            self._ws = ws
+            config = json.loads(await ws.recv())
+            if "config" not in config:
+                raise RuntimeError(f"Unexpected first message: {config}")
+
+            await self._timed("init", "init", self._initial_inputs())
+            for _ in range(actions):
+                await asyncio.sleep(self.rng.uniform(0, think_time))
+                action, data = self._next_action()
+                await self._timed(action, "update", data)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def report(results, elapsed, sessions, server):
+    print(f"{sessions} sessions, {len(results)} actions in {elapsed:.1f}s "
+          f"({len(results) / elapsed:.2f} actions/s)")
+    print(f"{'action':<10}{'count':>7}{'failed':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for action in ["init"] + list(ACTIONS):
+        latencies = [latency for name, latency in results if name == action and latency is not None]
+        failed = sum(1 for name, latency in results if name == action and latency is None)
+        if not latencies:
+            if failed:
+                print(f"{action:<10}{failed:>7}{failed:>8}")
+            continue
+        stats = [percentile(latencies, 50), percentile(latencies, 90), percentile(latencies, 99), max(latencies)]
+        print(f"{action:<10}{len(latencies) + failed:>7}{failed:>8}" + "".join(f"{value:>8.2f}s" for value in stats))
+
+    if server is not None:
+        print(f"Server CPU: {server['cpu_mean']:.0f}% mean, {server['cpu_peak']:.0f}% peak "
+              f"(100% is one core)")
+        print(f"Server memory: {server['rss_start']:.0f} MB at start, {server['rss_peak']:.0f} MB peak")
+
+
+def launch_app(port):
+    """
+    Start app.py on a local port and wait until it answers.
+
+    :return: The server process.
+    """
+    process = subprocess.Popen([sys.executable, "-m", "shiny", "run", "--port", str(port), "app.py"],
+                               cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The app exited while starting")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("The app did not start within 60s")
+
+
+async def run_sessions(base_url, outputs, sessions, actions, think_time, seed, timeout):
+    clients = [Session(base_url, outputs, random.Random(seed + i), timeout) for i in range(sessions)]
+    outcomes = await asyncio.gather(*(client.run(actions, think_time) for client in clients),
+                                    return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            print(f"Session failed: {outcome!r}", file=sys.stderr)
+    return [result for client in clients for result in client.results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard sessions and report latency and load.")
+    parser.add_argument("--url", help="URL of a running app (default: start app.py on --port)")
+    parser.add_argument("--port", type=int, default=8765, help="Port app.py is started on")
+    parser.add_argument("--pid", type=int, help="Process id of the server at --url, to sample its CPU and memory")
+    parser.add_argument("--sessions", type=int, default=10, help="Number of concurrent sessions")
+    parser.add_argument("--actions", type=int, default=10, help="Actions per session after the page load")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Maximum pause between two actions, in seconds")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds an action may take")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the simulated users")
+    args = parser.parse_args()
+
+    process = None
+    if args.url is None:
+        process = launch_app(args.port)
+        base_url, pid = f"http://127.0.0.1:{args.port}", process.pid
+    else:
+        base_url, pid = args.url, args.pid
+
+    try:
+        outputs = find_outputs(base_url)
+        monitor = ServerMonitor(pid) if pid else None
+
+        start = time.perf_counter()
+        with monitor if monitor is not None else nullcontext():
+            results = asyncio.run(run_sessions(base_url, outputs, args.sessions, args.actions,
+                                               args.think_time, args.seed, args.timeout))
+        elapsed = time.perf_counter() - start
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    report(results, elapsed, args.sessions, monitor.summary() if monitor is not None else None)
+    sys.exit(1 if not results or any(latency is None for _, latency in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the features using them may import, never the app at startup
+HEAVY_MODULES = ["matplotlib", "seaborn", "sklearn", "plotly", "transformers", "torch", "selenium"]
+
+# Import time budget of app.py, in seconds
+STARTUP_BUDGET = 2.0
+
+
+def profile_import(module="app", env=None, cwd=REPO_DIR):
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    :param module: The module to import, from the repository root.
+    :param env: Environment of the interpreter (default: this one's).
+    :param cwd: Working directory of the interpreter.
+    :return: Tuple of (wall time in seconds, list of (cumulative microseconds, module name), loaded modules).
+    """
+    code = f"import sys, json; import {module}; print(json.dumps(sorted(sys.modules)))"
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=cwd, env=env, capture_output=True, text=True)
+    wall_time = time.perf_counter() - start
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings.append((int(cumulative), name.strip()))
+
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return wall_time, timings, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the import time of the dashboard and check its budget.")
+    parser.add_argument("--module", default="app", help="Module to import (default: app)")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET, help="Startup budget in seconds")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest top-level imports listed")
+    args = parser.parse_args()
+
+    wall_time, timings, loaded = profile_import(args.module)
+
+    # Top-level packages only, their cumulative time includes their submodules
+    top_level = {}
+    for cumulative, name in timings:
+        package = name.lstrip().split(".")[0]
+        top_level[package] = max(top_level.get(package, 0), cumulative)
+
+    print(f"Slowest imports of {args.module}:")
+    for package, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {cumulative / 1e6:7.3f}s  {package}")
+    print(f"Total: {wall_time:.3f}s (budget {args.budget:.1f}s)")
+
+    failures = []
+    eager = [module for module in HEAVY_MODULES if module in loaded]
+    if eager:
+        failures.append(f"heavy modules imported at startup: {', '.join(eager)}")
+    if wall_time > args.budget:
+        failures.append(f"startup took {wall_time:.3f}s, over the {args.budget:.1f}s budget")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
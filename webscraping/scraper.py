@@ -1,14 +1,24 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
 import time
 import pandas as pd
 
-def scrape_restaurant_data(restaurants, filename=None):
+def scrape_restaurant_data(restaurants, filename=None, on_result=None):
+    """
+    Scrape the number of employees of the restaurants from Listafirme.
+
+    :param restaurants: Names of the restaurants.
+    :param filename: CSV file to save the scraped data to (optional).
+    :param on_result: Called with each {"Name", "Company", "Address", "Employees"} record as soon as it is scraped,
+                      restaurants that failed get one with "Error" as the number of employees (optional).
+    :return: The number of employees of the first restaurant, None without restaurants.
+    """
+    # Selenium is only imported when scraping, importing this module stays cheap
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.chrome.options import Options
+    from bs4 import BeautifulSoup
 
     # Set up Chrome options for headless mode
     chrome_options = Options()
@@ -21,6 +31,11 @@ def scrape_restaurant_data(restaurants, filename=None):
     driver = webdriver.Chrome(options=chrome_options)
     data = []
 
+    def add_record(record):
+        data.append(record)
+        if on_result is not None:
+            on_result(record)
+
     for i, restaurant in enumerate(restaurants):
         search_query = f"{restaurant} cluj restaurant listafirme"
         driver.get("https://www.google.com")
@@ -48,6 +63,7 @@ def scrape_restaurant_data(restaurants, filename=None):
             time.sleep(2)
         except Exception as e:
             print(f"Error interacting with search box for {restaurant}: {e}")
+            add_record({"Name": restaurant, "Company": "", "Address": "", "Employees": "Error"})
             continue
         
         # Click on the first Listafirme link
@@ -75,6 +91,7 @@ def scrape_restaurant_data(restaurants, filename=None):
                     break
         except Exception as e:
             print(f"Error finding Listafirme link for {restaurant}: {e}")
+            add_record({"Name": restaurant, "Company": "", "Address": "", "Employees": "Error"})
             continue
         
         # Scrape Listafirme Page
@@ -93,11 +110,18 @@ def scrape_restaurant_data(restaurants, filename=None):
                     employees = "Row Not Found"
             else:
                 employees = "Table Not Found"
+
+            # The company the page belongs to, used to check it is the right restaurant
+            title = soup.find("h1")
+            company = title.text.strip() if title else ""
+            street_address = soup.find(attrs={"itemprop": "streetAddress"})
+            address = street_address.text.strip() if street_address else ""
             
-            data.append({"Name": restaurant, "Employees": employees})
+            record = {"Name": restaurant, "Company": company, "Address": address, "Employees": employees}
         except Exception as e:
             print(f"Error scraping data for {restaurant}: {e}")
-            data.append({"Name": restaurant, "Employees": "Error"})
+            record = {"Name": restaurant, "Company": "", "Address": "", "Employees": "Error"}
+        add_record(record)
     
     driver.quit()
     
@@ -107,7 +131,7 @@ def scrape_restaurant_data(restaurants, filename=None):
         df.to_csv(filename, index=False)
         print(f"Data saved to {filename}")
 
-    return data[0]['Employees']
+    return data[0]['Employees'] if data else None
 
 # List of restaurants to scrape
 #restaurants = ["rosa", "bulgakov cafe", "via"]
@@ -0,0 +1,309 @@
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup
+
+BASE_URL = "https://www.tripadvisor.com"
+LISTING_PATH = "/Restaurants-g298474{offset}-Cluj_Napoca_Cluj_County_Northwest_Romania_Transylvania.html"
+PAGE_SIZE = 30  # Restaurants per listing page
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+RESTAURANTS_CSV = "./data/tripadvisor_restaurants.csv"
+REVIEWS_FILE = "./data/tripadvisor_reviews.jsonl"
+PROGRESS_FILE = "./data/tripadvisor_progress.json"
+
+
+class HostRateLimiter:
+    """
+    Space out the requests sent to the same host, shared by all the worker threads.
+    """
+
+    def __init__(self, min_interval=2.0):
+        """
+        :param min_interval: Minimum number of seconds between two requests to the same host.
+        """
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """
+        Block until a request to the host of the url is allowed.
+
+        :param url: The url about to be requested.
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class TripAdvisorCollector:
+
+    def __init__(self, max_workers=4, min_interval=2.0, restaurants_csv=RESTAURANTS_CSV,
+                 reviews_file=REVIEWS_FILE, progress_file=PROGRESS_FILE):
+        """
+        Initialize the TripAdvisor review collector.
+
+        :param max_workers: Size of the thread pool fetching pages.
+        :param min_interval: Minimum number of seconds between two requests to the same host.
+        :param restaurants_csv: CSV file the restaurants are appended to.
+        :param reviews_file: JSON lines file the reviews are appended to, one restaurant per line.
+        :param progress_file: JSON file recording the completed listing pages.
+        """
+        self.max_workers = max_workers
+        self.rate_limiter = HostRateLimiter(min_interval)
+        self.restaurants_csv = restaurants_csv
+        self.reviews_file = reviews_file
+        self.progress_file = progress_file
+        self._local = threading.local()
+
+    def _get(self, url):
+        # One session per thread, so every worker keeps its own connection alive
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            self._local.session = session
+
+        self.rate_limiter.wait(url)
+        response = session.get(url, timeout=30)
+        response.raise_for_status()
+        return response.text
+
+    @staticmethod
+    def listing_url(page):
+        """
+        Build the url of a listing page.
+
+        :param page: Index of the page, starting from 0.
+        :return: The url of the page.
+        """
+        offset = f"-oa{page * PAGE_SIZE}" if page else ""
+        return BASE_URL + LISTING_PATH.format(offset=offset)
+
+    def fetch_listing(self, page):
+        """
+        Fetch the restaurants listed on a page.
+
+        :param page: Index of the page, starting from 0.
+        :return: List of restaurant dicts with Name, Rating, Type and Link.
+        """
+        soup = BeautifulSoup(self._get(self.listing_url(page)), 'html.parser')
+
+        restaurants = []
+        for entry in soup.find_all('div', class_='list_item'):
+            try:
+                name_link = entry.find('a', class_='restaurant_name')
+                restaurants.append({
+                    'Name': name_link.text.strip(),
+                    'Rating': entry.find('span', class_='ui_bubble_rating')['class'][1].split('_')[-1],
+                    'Type': entry.find('div', class_='cuisines').text.strip(),
+                    'Link': BASE_URL + name_link['href']
+                })
+            except Exception as e:
+                print(f"Error parsing a restaurant on page {page}: {e}")
+        return restaurants
+
+    def fetch_reviews(self, link, min_year=2024, max_reviews=100):
+        """
+        Fetch the reviews of a restaurant.
+
+        :param link: Url of the restaurant page.
+        :param min_year: Reviews older than this year are skipped.
+        :param max_reviews: Maximum number of reviews kept.
+        :return: List of review dicts with Date (ISO format) and Review.
+        """
+        soup = BeautifulSoup(self._get(link), 'html.parser')
+
+        reviews = []
+        for entry in soup.find_all('div', class_='review-container'):
+            try:
+                review_date = datetime.strptime(entry.find('span', class_='ratingDate')['title'], '%B %d, %Y')
+                if review_date.year < min_year:
+                    continue
+
+                reviews.append({
+                    'Date': review_date.date().isoformat(),
+                    'Review': entry.find('p', class_='partial_entry').text.strip()
+                })
+                if len(reviews) >= max_reviews:
+                    break
+            except Exception as e:
+                print(f"Error fetching a review: {e}")
+        return reviews
+
+    def _load_progress(self):
+        """
+        Load the completed pages and the restaurants already written to disk.
+        """
+        try:
+            with open(self.progress_file, "r", encoding="utf-8") as file:
+                completed_pages = set(json.load(file)["completed_pages"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            completed_pages = set()
+
+        collected_links = set()
+        if os.path.exists(self.reviews_file):
+            with open(self.reviews_file, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        collected_links.add(json.loads(line)["Link"])
+                    except (json.JSONDecodeError, KeyError):
+                        # A line cut short by an interrupted run
+                        continue
+        return completed_pages, collected_links
+
+    def _save_progress(self, completed_pages):
+        tmp_file = self.progress_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as file:
+            json.dump({"completed_pages": sorted(completed_pages)}, file)
+        os.replace(tmp_file, self.progress_file)
+
+    def collect(self, max_pages=5):
+        """
+        Collect the restaurants and their reviews, resuming after the last completed page.
+
+        Listing pages and restaurant pages are fetched concurrently, every restaurant is
+        written to disk as soon as its reviews arrive.
+
+        :param max_pages: Number of listing pages to go through.
+        :return: Number of restaurants collected in this run.
+        """
+        completed_pages, collected_links = self._load_progress()
+        pages = [page for page in range(max_pages) if page not in completed_pages]
+        if not pages:
+            print("All the listing pages are already collected")
+            return 0
+
+        collected = 0
+        pending = {}  # page -> number of restaurants still being fetched
+        write_header = not os.path.exists(self.restaurants_csv)
+
+        with open(self.restaurants_csv, "a", newline="", encoding="utf-8") as restaurants_file, \
+                open(self.reviews_file, "a", encoding="utf-8") as reviews_file, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            writer = csv.writer(restaurants_file)
+            if write_header:
+                writer.writerow(["Name", "Rating", "Type", "Link", "Reviews"])
+
+            listing_futures = {executor.submit(self.fetch_listing, page): page for page in pages}
+            review_futures = {}
+
+            for future in as_completed(listing_futures):
+                page = listing_futures[future]
+                try:
+                    listed = future.result()
+                except Exception as e:
+                    print(f"Error fetching listing page {page}: {e}")
+                    continue
+
+                todo = [restaurant for restaurant in listed if restaurant['Link'] not in collected_links]
+                pending[page] = len(todo)
+                for restaurant in todo:
+                    review_futures[executor.submit(self.fetch_reviews, restaurant['Link'])] = (page, restaurant)
+                if not todo:
+                    completed_pages.add(page)
+                    self._save_progress(completed_pages)
+
+            for future in as_completed(review_futures):
+                page, restaurant = review_futures[future]
+                try:
+                    reviews = future.result()
+                except Exception as e:
+                    # The page stays incomplete, so the restaurant is retried on the next run
+                    print(f"Error fetching the reviews of {restaurant['Name']}: {e}")
+                    continue
+
+                writer.writerow([restaurant['Name'], restaurant['Rating'], restaurant['Type'],
+                                 restaurant['Link'], len(reviews)])
+                reviews_file.write(json.dumps(dict(restaurant, Reviews=reviews), ensure_ascii=False) + "\n")
+                restaurants_file.flush()
+                reviews_file.flush()
+                collected += 1
+
+                pending[page] -= 1
+                if pending[page] == 0:
+                    completed_pages.add(page)
+                    self._save_progress(completed_pages)
+
+        print(f"Collected {collected} restaurants, {len(completed_pages)}/{max_pages} pages completed")
+        return collected
+
+
+def tag_collected_reviews(reviews_file=REVIEWS_FILE, json_file="./data/reviews_with_emotions_google.json",
+                          repository=None):
+    """
+    Run the collected TripAdvisor reviews through the emotion tagging stage used for
+    the Google reviews and append them to the same JSON file and restaurant repository.
+
+    Restaurants already tagged from TripAdvisor are skipped.
+
+    :param reviews_file: JSON lines file written by TripAdvisorCollector.
+    :param json_file: The JSON file with the reviews and their emotions.
+    :param repository: RestaurantRepository the dashboard reads (default: the one in ./data).
+    """
+    from places_api.dedup import ReviewDeduplicator
+    from places_api.emotions import tag_reviews
+    from places_api.repository import RestaurantRepository
+    from places_api.restaurants import Restaurant
+
+    if repository is None:
+        repository = RestaurantRepository()
+
+    # Reviews cross-posted to Google reuse their emotions
+    deduplicator = ReviewDeduplicator()
+    deduplicator.seed_from_json(json_file)
+
+    try:
+        with open(json_file, "r", encoding="utf-8") as file:
+            tagged = {review["restaurant_name"] for review in json.load(file)
+                      if review.get("source") == "tripadvisor"}
+    except (FileNotFoundError, json.JSONDecodeError):
+        tagged = set()
+
+    with open(reviews_file, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                restaurant = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if restaurant["Name"] in tagged:
+                continue
+
+            fields = [{"time": int(datetime.fromisoformat(review["Date"]).replace(tzinfo=timezone.utc).timestamp())}
+                      for review in restaurant["Reviews"]]
+            review_data = tag_reviews(restaurant["Name"], [review["Review"] for review in restaurant["Reviews"]],
+                                      source="tripadvisor", deduplicator=deduplicator, fields=fields)
+            Restaurant._write_to_json(json_file, review_data)
+            # Matched to a Google place by name when there is one
+            repository.add_reviews(review_data)
+            tagged.add(restaurant["Name"])
+
+    print(deduplicator.report())
+
+
+def fetch_restaurant_data(max_pages=5):
+    collector = TripAdvisorCollector()
+    collector.collect(max_pages)
+    tag_collected_reviews()
+
+
+if __name__ == "__main__":
+    # Run the scraper
+    fetch_restaurant_data()